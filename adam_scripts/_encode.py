@@ -5,10 +5,11 @@
 #--------------------------------------------------------------------------
 
 import calendar
+import functools
 import struct
 import uuid
 from datetime import datetime
-from typing import Iterable, Union, Tuple, Dict  # pylint: disable=unused-import
+from typing import Iterable, Union, Tuple, Dict, List, Optional  # pylint: disable=unused-import
 
 import six
 
@@ -540,19 +541,30 @@ def encode_node_properties(value):
           more symbols which are valid distribution-modes. That is, the value MUST be of the same type as would be valid
           in a field defined with the following attributes:
           type="symbol" multiple="true" requires="distribution-mode"
+
+    The lifetime policy may be given as the descriptor code of the policy, e.g. 0x0000002b for
+    delete-on-close, and the distribution modes as a symbol or a list of symbols. Any other property
+    is encoded as the value of a fields map.
     """
     if not value:
         return {TYPE: AMQPTypes.null, VALUE: None}
-    # TODO
     fields = {TYPE: AMQPTypes.map, VALUE:[]}
-    # fields[{TYPE: AMQPTypes.symbol, VALUE: b'lifetime-policy'}] = {
-    #     TYPE: AMQPTypes.described,
-    #     VALUE: (
-    #         {TYPE: AMQPTypes.ulong, VALUE: value['lifetime_policy']},
-    #         {TYPE: AMQPTypes.list, VALUE: []}
-    #     )
-    # }
-    # fields[{TYPE: AMQPTypes.symbol, VALUE: b'supported-dist-modes'}] = {}
+    for key, data in value.items():
+        if isinstance(key, six.text_type):
+            key = key.encode('utf-8')
+        if key == b'lifetime-policy' and isinstance(data, int):
+            data = {
+                TYPE: AMQPTypes.described,
+                VALUE: (
+                    {TYPE: AMQPTypes.ulong, VALUE: data},
+                    {TYPE: AMQPTypes.list, VALUE: []}
+                )
+            }
+        elif key == b'supported-dist-modes':
+            if isinstance(data, (six.text_type, six.binary_type)):
+                data = [data]
+            data = {TYPE: AMQPTypes.array, VALUE: [{TYPE: AMQPTypes.symbol, VALUE: mode} for mode in data]}
+        fields[VALUE].append(({TYPE: AMQPTypes.symbol, VALUE: key}, data))
     return fields
 
 
@@ -733,14 +745,370 @@ def describe_performative(performative):
     }
 
 
+# Dict-free encoding.
+# The encoders below take the values of performatives and messages as they are, rather than first
+# wrapping every field in a {TYPE: ..., VALUE: ...} dict to be dispatched by `encode_value`.
+# The output is byte-identical to that of `describe_performative` and `encode_payload`.
+
+def _encode_any(output, value, **kwargs):
+    # type: (bytearray, Any, Any) -> None
+    # Values supplied by the caller may still be TYPE/VALUE dicts.
+    if isinstance(value, dict):
+        encode_value(output, value, **kwargs)
+    else:
+        encode_unknown(output, value, **kwargs)
+
+
+def _encode_compound(output, encoded_values, count, small, large):
+    # type: (bytearray, bytearray, int, bytes, bytes) -> None
+    # As the list and map encoders, for entries that have already been encoded.
+    encoded_size = len(encoded_values)
+    if count <= 255 and encoded_size < 255:
+        output.extend(small)
+        output.extend(struct.pack('>B', encoded_size + 1))
+        output.extend(struct.pack('>B', count))
+    else:
+        try:
+            output.extend(large)
+            output.extend(struct.pack('>L', encoded_size + 4))
+            output.extend(struct.pack('>L', count))
+        except struct.error:
+            raise ValueError("Value is too large or too long to be encoded.")
+    output.extend(encoded_values)
+
+
+def _encode_fields_direct(output, value):
+    # type: (bytearray, Optional[Dict[str, Any]]) -> None
+    if not value:
+        encode_null(output)
+        return
+    encoded_values = bytearray()
+    for key, data in value.items():
+        encode_symbol(encoded_values, key)
+        _encode_any(encoded_values, data, with_constructor=True)
+    _encode_compound(output, encoded_values, len(value) * 2, ConstructorBytes.map_small, ConstructorBytes.map_large)
+
+
+def _encode_annotations_direct(output, value):
+    # type: (bytearray, Optional[Dict[str, Any]]) -> None
+    if not value:
+        encode_null(output)
+        return
+    encoded_values = bytearray()
+    for key, data in value.items():
+        if isinstance(key, int):
+            encode_ulong(encoded_values, key)
+        else:
+            encode_symbol(encoded_values, key)
+        encode_unknown(encoded_values, data, with_constructor=True)
+    _encode_compound(output, encoded_values, len(value) * 2, ConstructorBytes.map_small, ConstructorBytes.map_large)
+
+
+def _encode_application_properties_direct(output, value):
+    # type: (bytearray, Optional[Dict[str, Any]]) -> None
+    if not value:
+        encode_null(output)
+        return
+    encoded_values = bytearray()
+    for key, data in value.items():
+        encode_string(encoded_values, key)
+        _encode_any(encoded_values, data, with_constructor=True)
+    _encode_compound(output, encoded_values, len(value) * 2, ConstructorBytes.map_small, ConstructorBytes.map_large)
+
+
+def _encode_message_id_direct(output, value):
+    # type: (bytearray, Any) -> None
+    if isinstance(value, int):
+        encode_ulong(output, value)
+    elif isinstance(value, uuid.UUID):
+        encode_uuid(output, value)
+    elif isinstance(value, six.binary_type):
+        encode_binary(output, value)
+    elif isinstance(value, six.text_type):
+        encode_string(output, value)
+    else:
+        raise TypeError("Unsupported Message ID type.")
+
+
+def _encode_node_properties_direct(output, value):
+    # type: (bytearray, Optional[Dict[str, Any]]) -> None
+    # Only sent when attaching to a dynamic node, so shares the generic encoding.
+    encode_value(output, encode_node_properties(value))
+
+
+def _encode_filter_set_direct(output, value):
+    # type: (bytearray, Optional[Dict[str, Any]]) -> None
+    if not value:
+        encode_null(output)
+        return
+    encoded_values = bytearray()
+    for name, data in value.items():
+        encode_symbol(encoded_values, name)
+        if data is None:
+            encode_null(encoded_values)
+        else:
+            descriptor, filter_value = data
+            encoded_values.extend(ConstructorBytes.descriptor)
+            encode_symbol(encoded_values, descriptor)
+            _encode_any(encoded_values, filter_value, with_constructor=True)
+    _encode_compound(output, encoded_values, len(value) * 2, ConstructorBytes.map_small, ConstructorBytes.map_large)
+
+
+_DIRECT_FIELD_DEFINITIONS = {
+    FieldDefinition.fields: _encode_fields_direct,
+    FieldDefinition.annotations: _encode_annotations_direct,
+    FieldDefinition.message_id: _encode_message_id_direct,
+    FieldDefinition.app_properties: _encode_application_properties_direct,
+    FieldDefinition.node_properties: _encode_node_properties_direct,
+    FieldDefinition.filter_set: _encode_filter_set_direct,
+}
+
+
+def _encode_field(output, value, field, compact=False):
+    # type: (bytearray, Any, FIELD, bool) -> bool
+    # Returns whether the field was encoded, as fields without a definition are only encoded when None.
+    if value is None:
+        encode_null(output)
+    elif field is None:
+        return False
+    elif isinstance(field.type, FieldDefinition):
+        if field.multiple:
+            # Arrays are only found in link setup, and are left to the generic encoder.
+            encode_array(output, [_FIELD_DEFINITIONS[field.type](v) for v in value], with_constructor=True)
+        else:
+            _DIRECT_FIELD_DEFINITIONS[field.type](output, value)
+    elif isinstance(field.type, ObjDefinition):
+        encode_performative(output, value, compact=compact)
+    elif field.multiple:
+        encode_array(output, [{TYPE: field.type, VALUE: v} for v in value], with_constructor=True)
+    else:
+        # A compact boolean is encoded as 0x41 or 0x42 instead of 0x56 followed by the value.
+        _ENCODE_MAP[field.type](output, value, with_constructor=not compact or field.type != AMQPTypes.boolean)
+    return True
+
+
+def encode_performative(output, performative, compact=False):
+    # type: (bytearray, Performative, bool) -> None
+    """Encode a performative, or any other described list with a `_definition`, straight from its fields.
+
+    The output is identical to `encode_value(output, describe_performative(performative))`, unless
+    `compact` is set. A compact list leaves out its trailing None fields and any field without a
+    definition, and encodes its booleans without the 0x56 constructor. This applies to nested lists too.
+    """
+    encoded_values = bytearray()
+    count = 0
+    if compact:
+        end = 0
+        for value, field in zip(performative, performative._definition):
+            if field is not None and _encode_field(encoded_values, value, field, compact=True):
+                count += 1
+                if value is not None:
+                    end, kept = len(encoded_values), count
+        if end == 0:
+            count = 0
+        else:
+            del encoded_values[end:]
+            count = kept
+    else:
+        for value, field in zip(performative, performative._definition):
+            if _encode_field(encoded_values, value, field):
+                count += 1
+    output.extend(ConstructorBytes.descriptor)
+    encode_ulong(output, performative._code)
+    if count == 0:
+        output.extend(ConstructorBytes.list_0)
+        return
+    _encode_compound(output, encoded_values, count, ConstructorBytes.list_small, ConstructorBytes.list_large)
+
+
+# Compiled encoders.
+# Rather than walking `_definition` for every frame, each performative class gets an encoder whose
+# body is unrolled field by field, with the encoder of each field's type looked up once when it
+# is generated. The output is identical to that of `encode_performative`.
+
+_COMPILED_ENCODERS = {}  # type: Dict[Tuple[type, bool], Callable[[bytearray, Any], None]]
+
+
+def _field_source(index, field, compact=False, kept=0):
+    # type: (int, FIELD, bool, int) -> List[str]
+    variable = "v{}".format(index)
+    if compact and field is None:
+        return []
+    lines = ["    if {} is None:".format(variable), "        encoded_values.extend(b'\\x40')"]
+    if field is None:
+        # Not encoded unless it is None, see `describe_performative`.
+        lines.append("        count += 1")
+        return lines
+    lines.append("    else:")
+    if isinstance(field.type, FieldDefinition):
+        if field.multiple:
+            statement = "encode_array(encoded_values, [t{i}(v) for v in {v}], with_constructor=True)"
+        else:
+            statement = "d{i}(encoded_values, {v})"
+    elif isinstance(field.type, ObjDefinition):
+        statement = "encode_compiled(encoded_values, {v}, compact)"
+    elif field.multiple:
+        statement = "encode_array(encoded_values, [{{TYPE: t{i}, VALUE: v}} for v in {v}], with_constructor=True)"
+    elif field.type == AMQPTypes.boolean and compact:
+        statement = "encoded_values.extend(b'\\x41' if {v} else b'\\x42')"
+    elif field.type == AMQPTypes.boolean:
+        statement = "encoded_values.extend(b'\\x56\\x01' if {v} else b'\\x56\\x00')"
+    else:
+        statement = "e{i}(encoded_values, {v})"
+    lines.append("        " + statement.format(i=index, v=variable))
+    if compact:
+        # Where the list ends if none of the fields that follow are set.
+        lines.append("        end = len(encoded_values)")
+        lines.append("        count = {}".format(kept))
+    return lines
+
+
+def generate_encoder_source(performative_type, compact=False):
+    # type: (type, bool) -> str
+    """Return the source of the encoder for instances of `performative_type`.
+
+    The generated function takes `(output, performative)` and appends the encoded performative,
+    as `encode_performative` would with the same `compact` setting.
+    """
+    definition = performative_type._definition
+    variables = ["v{}".format(index) for index in range(len(definition))]
+    lines = ["def _encode_{}(output, performative):".format(performative_type.__name__)]
+    lines.append("    output.extend(prefix)")
+    if not definition:
+        lines.append("    output.extend(b'\\x45')")
+        return "\n".join(lines) + "\n"
+    lines.append("    {} = performative".format(", ".join(variables) + ("," if len(variables) == 1 else "")))
+    lines.append("    encoded_values = bytearray()")
+    if compact:
+        lines.append("    end = count = 0")
+        kept = 0
+        for index, field in enumerate(definition):
+            if field is not None:
+                kept += 1
+            lines.extend(_field_source(index, field, compact=True, kept=kept))
+        lines.append("    if count == 0:")
+        lines.append("        output.extend(b'\\x45')")
+        lines.append("        return")
+        lines.append("    del encoded_values[end:]")
+        lines.append("    _encode_compound(output, encoded_values, count, b'\\xc0', b'\\xd0')")
+        return "\n".join(lines) + "\n"
+    count = sum(1 for field in definition if field is not None)
+    lines.append("    count = {}".format(count))
+    for index, field in enumerate(definition):
+        lines.extend(_field_source(index, field))
+    if not count:
+        lines.append("    if count == 0:")
+        lines.append("        output.extend(b'\\x45')")
+        lines.append("        return")
+    lines.append("    _encode_compound(output, encoded_values, count, b'\\xc0', b'\\xd0')")
+    return "\n".join(lines) + "\n"
+
+
+def compile_encoder(performative_type, compact=False):
+    # type: (type, bool) -> Callable[[bytearray, Any], None]
+    """Generate and compile the encoder for instances of `performative_type`."""
+    prefix = bytearray(ConstructorBytes.descriptor)
+    encode_ulong(prefix, performative_type._code)
+    namespace = {
+        "prefix": bytes(prefix),
+        "TYPE": TYPE,
+        "VALUE": VALUE,
+        "encode_array": encode_array,
+        "encode_compiled": encode_compiled,
+        "_encode_compound": _encode_compound,
+        "compact": compact,
+    }
+    for index, field in enumerate(performative_type._definition):
+        if field is None:
+            continue
+        if isinstance(field.type, FieldDefinition):
+            namespace["t{}".format(index)] = _FIELD_DEFINITIONS[field.type]
+            namespace["d{}".format(index)] = _DIRECT_FIELD_DEFINITIONS[field.type]
+        elif not isinstance(field.type, ObjDefinition):
+            namespace["t{}".format(index)] = field.type
+            namespace["e{}".format(index)] = _ENCODE_MAP[field.type]
+    name = "_encode_{}".format(performative_type.__name__)
+    source = generate_encoder_source(performative_type, compact=compact)
+    exec(compile(source, "<{}>".format(name), "exec"), namespace)  # pylint: disable=exec-used
+    return namespace[name]
+
+
+def encode_compiled(output, performative, compact=False):
+    # type: (bytearray, Any, bool) -> None
+    """Encode `performative` with the compiled encoder for its class, which is generated on first use.
+
+    See `encode_performative` for `compact`.
+    """
+    key = (performative.__class__, compact)
+    try:
+        encoder = _COMPILED_ENCODERS[key]
+    except KeyError:
+        if len(performative) != len(performative._definition):
+            # The generated encoder unpacks every field, so anything else is left to the interpreted one.
+            encoder = functools.partial(encode_performative, compact=compact)
+        else:
+            encoder = compile_encoder(performative.__class__, compact=compact)
+        _COMPILED_ENCODERS[key] = encoder
+    encoder(output, performative)
+
+
+def _encode_section_descriptor(output, code):
+    # type: (bytearray, int) -> None
+    output.extend(ConstructorBytes.descriptor)
+    encode_ulong(output, code)
+
+
+def encode_payload_direct(output, payload):
+    # type: (bytearray, Message) -> bytes
+    """Encode the sections of a message straight from its fields.
+
+    The output is identical to that of `encode_payload`.
+    """
+    if payload[0]:  # header
+        encode_compiled(output, payload[0], compact=True)
+
+    if payload[2]:  # message annotations
+        _encode_section_descriptor(output, 0x00000072)
+        _encode_annotations_direct(output, payload[2])
+
+    if payload[3]:  # properties
+        encode_compiled(output, payload[3], compact=True)
+
+    if payload[4]:  # application properties
+        _encode_section_descriptor(output, 0x00000074)
+        encode_map(output, payload[4])
+
+    if payload[5]:  # data
+        for item_value in payload[5]:
+            _encode_section_descriptor(output, 0x00000075)
+            encode_binary(output, item_value)
+
+    if payload[6]:  # sequence
+        for item_value in payload[6]:
+            _encode_section_descriptor(output, 0x00000076)
+            encode_unknown(output, item_value)
+
+    if payload[7]:  # value
+        _encode_section_descriptor(output, 0x00000077)
+        encode_unknown(output, payload[7])
+
+    if payload[8]:  # footer
+        _encode_section_descriptor(output, 0x00000078)
+        _encode_annotations_direct(output, payload[8])
+
+    # The delivery annotations are encoded last, see `encode_payload`.
+    if payload[1]:  # delivery annotations
+        _encode_section_descriptor(output, 0x00000071)
+        _encode_annotations_direct(output, payload[1])
+
+    return output
+
+
 def encode_payload(output, payload):
     # type: (bytearray, Message) -> bytes
 
     if payload[0]:  # header
-        # TODO: Header and Properties encoding can be optimized to
-        #  1. not encoding trailing None fields
-        #  2. encoding bool without constructor
-        encode_value(output, describe_performative(payload[0]))
+        encode_performative(output, payload[0], compact=True)
 
     if payload[2]:  # message annotations
         encode_value(output, {
@@ -752,10 +1120,7 @@ def encode_payload(output, payload):
         })
 
     if payload[3]:  # properties
-        # TODO: Header and Properties encoding can be optimized to
-        #  1. not encoding trailing None fields
-        #  2. encoding bool without constructor
-        encode_value(output, describe_performative(payload[3]))
+        encode_performative(output, payload[3], compact=True)
 
     if payload[4]:  # application properties
         encode_value(output, {
@@ -970,6 +1335,16 @@ def encode_payload_expanded(output, payload):
     return output
 
 
+def _encode_frame_performative(output, frame):
+    # type: (bytearray, Performative) -> None
+    # A compact performative without any fields set is encoded as list0, but frame decoders read the
+    # count of the performative list as that of a list8 or list32. An empty frame body is kept as an
+    # empty list8 instead: the descriptor, the smallulong code and list0 make up the whole output.
+    encode_compiled(output, frame, compact=True)
+    if len(output) == 4 and output[3] == 0x45:
+        output[3:] = b'\xc0\x01\x00'
+
+
 def encode_frame(frame, frame_type=_FRAME_TYPE):
     # type: (Performative) -> Tuple(bytes, bytes)
     # TODO: allow passing type specific bytes manually, e.g. Empty Frame needs padding
@@ -978,12 +1353,130 @@ def encode_frame(frame, frame_type=_FRAME_TYPE):
         header = size.to_bytes(4, 'big') + _FRAME_OFFSET + frame_type
         return header, None
 
-    frame_description = describe_performative(frame)
     frame_data = bytearray()
-    encode_value(frame_data, frame_description)
+    _encode_frame_performative(frame_data, frame)
     if isinstance(frame, performatives.TransferFrame):
         frame_data += frame.payload
 
     size = len(frame_data) + 8
     header = size.to_bytes(4, 'big') + _FRAME_OFFSET + frame_type
     return header, frame_data
+
+
+def encode_frame_buffers(frame, frame_type=_FRAME_TYPE):
+    # type: (Performative, bytes) -> List[Union[bytes, bytearray, memoryview]]
+    """Encode a frame as a list of buffers for socket.sendmsg or writelines.
+
+    The buffers are the frame header, the encoded performative and, for a
+    transfer, a view over the payload. The payload is not copied, so it must
+    not be modified until the buffers have been written.
+    """
+    if frame is None:
+        size = 8
+        return [size.to_bytes(4, 'big') + _FRAME_OFFSET + frame_type]
+
+    frame_data = bytearray()
+    _encode_frame_performative(frame_data, frame)
+    buffers = [None, frame_data]
+    size = len(frame_data) + 8
+    if isinstance(frame, performatives.TransferFrame) and frame.payload:
+        payload = memoryview(frame.payload)
+        size += payload.nbytes
+        buffers.append(payload)
+
+    buffers[0] = size.to_bytes(4, 'big') + _FRAME_OFFSET + frame_type
+    return buffers
+
+
+# Frame templates.
+# Control frames such as flow and disposition are sent over and over again with only a few fields
+# changing. A template encodes the frame once, using fixed width encodings for the variable fields
+# so that the frame layout never changes, and patches new values in place when rendered.
+
+_FIXED_WIDTH_ENCODINGS = {
+    AMQPTypes.boolean: (ConstructorBytes.bool, struct.Struct('>?')),
+    AMQPTypes.ubyte: (ConstructorBytes.ubyte, struct.Struct('>B')),
+    AMQPTypes.ushort: (ConstructorBytes.ushort, struct.Struct('>H')),
+    AMQPTypes.uint: (ConstructorBytes.uint_large, struct.Struct('>I')),
+    AMQPTypes.ulong: (ConstructorBytes.ulong_large, struct.Struct('>Q')),
+    AMQPTypes.byte: (ConstructorBytes.byte, struct.Struct('>b')),
+    AMQPTypes.short: (ConstructorBytes.short, struct.Struct('>h')),
+    AMQPTypes.int: (ConstructorBytes.int_large, struct.Struct('>i')),
+    AMQPTypes.long: (ConstructorBytes.long_large, struct.Struct('>q')),
+}
+_CHANNEL = struct.Struct('>H')
+
+
+class FrameTemplate(object):
+    """A frame encoded once, whose variable fields are patched in place for every frame sent.
+
+    :param frame: The performative to encode, or None for an empty (heartbeat) frame. The values of the
+     variable fields are used as their defaults, and must not be None.
+    :param variable_fields: The names of the fields that can be changed when rendering. These must be
+     single valued fields of a fixed width type, e.g. the counters of a flow frame.
+    :param frame_type: The frame type byte.
+    """
+
+    def __init__(self, frame, variable_fields=(), frame_type=_FRAME_TYPE):
+        # type: (Optional[Performative], Iterable[str], bytes) -> None
+        variable_fields = set(variable_fields)
+        self._offsets = {}  # type: Dict[str, Tuple[int, struct.Struct]]
+        frame_data = bytearray()
+        if frame is not None:
+            unknown = variable_fields - set(frame._fields)
+            if unknown:
+                raise ValueError("Unknown fields for {}: {}".format(type(frame).__name__, sorted(unknown)))
+            # The fixed fields are encoded as a compact list, as by `encode_frame`. The variable fields
+            # are never None, so trimming the trailing None fields cannot move them.
+            encoded_values = bytearray()
+            count = end = kept = 0
+            offsets = {}
+            for name, value, field in zip(frame._fields, frame, frame._definition):
+                if name in variable_fields:
+                    if value is None or field is None or field.multiple or field.type not in _FIXED_WIDTH_ENCODINGS:
+                        raise ValueError("Field {} cannot be used as a variable field.".format(name))
+                    constructor, encoding = _FIXED_WIDTH_ENCODINGS[field.type]
+                    encoded_values.extend(constructor)
+                    offsets[name] = (len(encoded_values), encoding)
+                    encoded_values.extend(encoding.pack(value))
+                    count += 1
+                elif field is not None and _encode_field(encoded_values, value, field, compact=True):
+                    count += 1
+                else:
+                    continue
+                if value is not None:
+                    end, kept = len(encoded_values), count
+            del encoded_values[end:]
+            frame_data.extend(ConstructorBytes.descriptor)
+            encode_ulong(frame_data, frame._code)
+            # An empty frame body is an empty list8 rather than list0, see `_encode_frame_performative`.
+            _encode_compound(
+                frame_data, encoded_values, kept, ConstructorBytes.list_small, ConstructorBytes.list_large)
+            # The encoded values are the last thing written, the variable fields are relative to them.
+            start = 8 + len(frame_data) - len(encoded_values)
+            self._offsets = {name: (start + offset, encoding) for name, (offset, encoding) in offsets.items()}
+            if isinstance(frame, performatives.TransferFrame) and frame.payload:
+                frame_data += frame.payload
+
+        size = len(frame_data) + 8
+        self._frame = size.to_bytes(4, 'big') + _FRAME_OFFSET + frame_type + b'\x00\x00' + bytes(frame_data)
+
+    def render(self, channel=0, **values):
+        # type: (int, Any) -> bytearray
+        """Return the complete frame, including its header, for the given channel and field values.
+
+        Fields that are not supplied keep the value of the frame the template was created from.
+        """
+        output = bytearray(self._frame)
+        _CHANNEL.pack_into(output, 6, channel)
+        offsets = self._offsets
+        for name, value in values.items():
+            try:
+                offset, encoding = offsets[name]
+            except KeyError:
+                raise ValueError("{} is not a variable field of this template.".format(name))
+            try:
+                encoding.pack_into(output, offset, value)
+            except struct.error:
+                raise ValueError("Value supplied for {} invalid: {}".format(name, value))
+        return output
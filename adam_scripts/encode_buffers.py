@@ -0,0 +1,41 @@
+import timeit
+
+"""
+from uamqp._encode import encode_frame, encode_frame_buffers
+from uamqp.performatives import TransferFrame
+
+frame = TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=bytes(300000))
+header, frame_data = encode_frame(frame)
+
+assert header + frame_data == b''.join(encode_frame_buffers(frame))
+"""
+
+
+def encode_frame_playground(run_time):
+
+    SETUP_CODE = '''
+from uamqp._encode import encode_frame, encode_frame_buffers
+from uamqp.performatives import TransferFrame
+frame = TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=bytes(300000))
+    '''
+
+    TEST_CODE_UNOPTIMIZED = '''
+header, frame_data = encode_frame(frame)
+header + frame_data
+    '''
+    unoptimized = timeit.timeit(TEST_CODE_UNOPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    TEST_CODE_OPTIMIZED = '''
+encode_frame_buffers(frame)
+    '''
+    optimized = timeit.timeit(TEST_CODE_OPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    print(
+        'unoptimized: {}, optimized: {}, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+            unoptimized, optimized, optimized - unoptimized, optimized / unoptimized
+        )
+    )
+
+
+encode_frame_playground(run_time=1)
+# encode_frame_playground(run_time=10_000)
@@ -0,0 +1,79 @@
+import random
+import timeit
+
+from uamqp._encode import encode_performative, encode_compiled
+from uamqp.performatives import TransferFrame, FlowFrame, DispositionFrame
+from uamqp.message import Header, Properties
+from uamqp.outcomes import Accepted, Rejected
+from uamqp.error import AMQPError
+
+
+def random_performatives(count, seed=0):
+    rand = random.Random(seed)
+
+    def uint():
+        return rand.choice([None, 0, 1, 255, 256, 70000, 2 ** 32 - 1])
+
+    def boolean():
+        return rand.choice([None, True, False])
+
+    def state():
+        return rand.choice([None, Accepted(), Rejected(error=AMQPError(condition=b'amqp:internal-error', description='d'))])
+
+    for _ in range(count):
+        yield TransferFrame(
+            handle=uint(), delivery_id=uint(), delivery_tag=rand.choice([None, b'tag', b'\x00' * 300]),
+            message_format=uint(), settled=boolean(), more=boolean(), state=state(), resume=boolean(),
+            aborted=boolean(), batchable=boolean(), payload=b'payload')
+        yield FlowFrame(
+            next_incoming_id=uint(), incoming_window=uint(), next_outgoing_id=uint(), outgoing_window=uint(),
+            handle=uint(), delivery_count=uint(), link_credit=uint(), available=uint(), drain=boolean(),
+            echo=boolean(), properties=rand.choice([None, {b'key': 'value'}]))
+        yield DispositionFrame(
+            role=boolean(), first=uint(), last=uint(), settled=boolean(), state=state(), batchable=boolean())
+        yield Header(durable=boolean(), priority=rand.choice([None, 4]), ttl=uint(), first_acquirer=boolean())
+        yield Properties(
+            message_id=rand.choice([None, b'id', 'id', 5]), subject=rand.choice([None, 'subject']),
+            creation_time=rand.choice([None, 1600000000000]), group_sequence=uint())
+
+
+# The compiled encoders must produce the same bytes as the interpreted one.
+for performative in random_performatives(1000):
+    for compact in (False, True):
+        output1 = bytearray()
+        output2 = bytearray()
+        encode_performative(output1, performative, compact=compact)
+        encode_compiled(output2, performative, compact=compact)
+        assert output1 == output2, performative
+
+
+def encode_compiled_playground(run_time):
+
+    SETUP_CODE = '''
+from uamqp._encode import encode_performative, encode_compiled
+from uamqp.performatives import TransferFrame
+frame = TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=b'payload')
+output = bytearray()
+# Compile the encoder before timing it.
+encode_compiled(output, frame)
+    '''
+
+    TEST_CODE_UNOPTIMIZED = '''
+encode_performative(output, frame)
+    '''
+    unoptimized = timeit.timeit(TEST_CODE_UNOPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    TEST_CODE_OPTIMIZED = '''
+encode_compiled(output, frame)
+    '''
+    optimized = timeit.timeit(TEST_CODE_OPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    print(
+        'unoptimized: {}, optimized: {}, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+            unoptimized, optimized, optimized - unoptimized, optimized / unoptimized
+        )
+    )
+
+
+encode_compiled_playground(run_time=1)
+# encode_compiled_playground(run_time=10_000)
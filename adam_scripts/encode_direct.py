@@ -0,0 +1,109 @@
+import timeit
+
+from uamqp._encode import encode_value, describe_performative, encode_performative, encode_payload, encode_payload_direct
+from uamqp.endpoints import Source, Target
+from uamqp.error import AMQPError
+from uamqp.message import Message, Header, Properties
+from uamqp.outcomes import Accepted, Rejected
+from uamqp.performatives import (
+    OpenFrame, AttachFrame, FlowFrame, TransferFrame, DispositionFrame, EndFrame, CloseFrame)
+
+# The direct encoders must produce the same bytes as the generic ones.
+PERFORMATIVES = [
+    OpenFrame(container_id='container', hostname='host', max_frame_size=65536, idle_timeout=60000,
+              offered_capabilities=[b'cap'], properties={b'product': 'uamqp'}),
+    AttachFrame(name='link', handle=0, role=False, source=Source(address='amqps://host/queue'),
+                target=Target(address='queue'), initial_delivery_count=0, max_message_size=2 ** 40),
+    AttachFrame(name='dynamic', handle=1, role=True, source=Source(
+        dynamic=True, dynamic_node_properties={'lifetime-policy': 0x0000002b, 'supported-dist-modes': 'move'},
+        filters={b'selector': (b'apache.org:selector-filter:string', 'x > 1')}, outcomes=[b'amqp:accepted:list'])),
+    FlowFrame(next_incoming_id=0, incoming_window=100, next_outgoing_id=0, outgoing_window=100, handle=1,
+              delivery_count=0, link_credit=50, drain=False, properties={b'key': 'value'}),
+    TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=b'payload'),
+    TransferFrame(handle=1, delivery_id=2 ** 32 - 1, delivery_tag=b'\x00' * 300, settled=True, more=False,
+                  state=Accepted(), payload=b'payload'),
+    DispositionFrame(role=True, first=1, last=10, settled=True, state=Rejected(
+        error=AMQPError(condition=b'amqp:internal-error', description='error'))),
+    EndFrame(),
+    CloseFrame(error=AMQPError(condition=b'amqp:connection:forced')),
+]
+MESSAGES = [
+    Message(data=[b'test string value'], application_properties={'key': 'value'}),
+    Message(data=[b'first', b'second' * 100]),
+    Message(value={'key': [1, 2.5, None]}, header=Header(durable=True, priority=4),
+            properties=Properties(message_id=b'id', subject='subject', creation_time=1600000000000)),
+    Message(sequence=[[1, 2], ['a']], message_annotations={b'x-opt-key': 'value'},
+            delivery_annotations={b'x-opt-delivery': 1}, footer={b'x-opt-footer': True}),
+]
+
+for performative in PERFORMATIVES:
+    output1 = bytearray()
+    output2 = bytearray()
+    encode_value(output1, describe_performative(performative))
+    encode_performative(output2, performative)
+    assert output1 == output2, performative
+
+for message in MESSAGES:
+    output1 = bytearray()
+    output2 = bytearray()
+    encode_payload(output1, message)
+    encode_payload_direct(output2, message)
+    assert output1 == output2, message
+
+
+def encode_performative_playground(run_time):
+
+    SETUP_CODE = '''
+from uamqp._encode import encode_value, describe_performative, encode_performative
+from uamqp.performatives import TransferFrame
+frame = TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=b'payload')
+output = bytearray()
+    '''
+
+    TEST_CODE_UNOPTIMIZED = '''
+encode_value(output, describe_performative(frame))
+    '''
+    unoptimized = timeit.timeit(TEST_CODE_UNOPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    TEST_CODE_OPTIMIZED = '''
+encode_performative(output, frame)
+    '''
+    optimized = timeit.timeit(TEST_CODE_OPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    print(
+        'unoptimized: {}, optimized: {}, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+            unoptimized, optimized, optimized - unoptimized, optimized / unoptimized
+        )
+    )
+
+
+def encode_message_playground(run_time):
+
+    SETUP_CODE = '''
+from uamqp._encode import encode_payload, encode_payload_direct
+from uamqp.message import Message
+message = Message(data=[b'test string value'], application_properties={'key': 'value'})
+output = bytearray()
+    '''
+
+    TEST_CODE_UNOPTIMIZED = '''
+encode_payload(output, message)
+    '''
+    unoptimized = timeit.timeit(TEST_CODE_UNOPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    TEST_CODE_OPTIMIZED = '''
+encode_payload_direct(output, message)
+    '''
+    optimized = timeit.timeit(TEST_CODE_OPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    print(
+        'unoptimized: {}, optimized: {}, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+            unoptimized, optimized, optimized - unoptimized, optimized / unoptimized
+        )
+    )
+
+
+encode_performative_playground(run_time=1)
+encode_message_playground(run_time=1)
+# encode_performative_playground(run_time=10_000)
+# encode_message_playground(run_time=10_000)
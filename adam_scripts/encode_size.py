@@ -0,0 +1,59 @@
+from uamqp._decode import decode_frame
+from uamqp._encode import encode_performative, encode_frame
+from uamqp.message import Header, Properties
+from uamqp.endpoints import Source, Target
+from uamqp.performatives import AttachFrame, FlowFrame, TransferFrame, DispositionFrame, EndFrame, CloseFrame
+
+
+# As (performative, expected size of its compact encoding in bytes). A frame that grows is a regression.
+PERFORMATIVES = [
+    (Header(durable=True, priority=4), 9),
+    (Properties(message_id=b'id', content_type=b'application/json'), 33),
+    (AttachFrame(name='link', handle=0, role=False, source=Source(address='amqps://host/queue'), target=Target(address='queue')), 55),
+    (FlowFrame(next_incoming_id=0, incoming_window=100, next_outgoing_id=0, outgoing_window=100, handle=1, delivery_count=0, link_credit=50), 17),
+    (TransferFrame(handle=1, delivery_id=2, delivery_tag=b'tag', message_format=0, payload=b''), 16),
+    (DispositionFrame(role=True, first=1, settled=True), 11),
+    (EndFrame(), 4),
+    (CloseFrame(), 4),
+]
+
+
+def decoded_fields(data):
+    # The compact encoding leaves out the trailing None fields, of nested lists too, so these are
+    # trimmed from both encodings before comparing them. The transfer payload is dropped.
+    def trim(value):
+        if isinstance(value, dict):
+            return {key: trim(item) for key, item in value.items()}
+        if isinstance(value, list):
+            value = [trim(item) for item in value]
+            while value and value[-1] is None:
+                value.pop()
+        return value
+
+    frame_type, fields = decode_frame(memoryview(data))
+    if frame_type == 0x14:
+        fields.pop()
+    return frame_type, trim(fields)
+
+
+def encode_size_playground():
+
+    for performative, expected_size in PERFORMATIVES:
+        unoptimized = bytearray()
+        optimized = bytearray()
+        encode_performative(unoptimized, performative)
+        encode_performative(optimized, performative, compact=True)
+        assert len(optimized) == expected_size, (performative, len(optimized))
+        # Frames are sent as encoded by encode_frame, which must decode as the unoptimized performative.
+        sent = optimized if isinstance(performative, (Header, Properties)) else encode_frame(performative)[1]
+        assert decoded_fields(sent) == decoded_fields(unoptimized), performative
+
+        print(
+            '{}: unoptimized: {} bytes, optimized: {} bytes, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+                performative.__class__.__name__, len(unoptimized), len(optimized),
+                len(optimized) - len(unoptimized), len(optimized) / len(unoptimized)
+            )
+        )
+
+
+encode_size_playground()
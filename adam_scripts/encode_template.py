@@ -0,0 +1,56 @@
+import timeit
+
+from uamqp._decode import decode_frame
+from uamqp._encode import encode_frame, FrameTemplate
+from uamqp.constants import EMPTY_FRAME
+from uamqp.performatives import FlowFrame, DispositionFrame
+
+assert FrameTemplate(None).render() == EMPTY_FRAME
+
+# The frames differ in the width of the variable fields, and so are compared once decoded.
+frame = FlowFrame(next_incoming_id=0, incoming_window=100, next_outgoing_id=0, outgoing_window=100, handle=1, delivery_count=0, link_credit=50)
+template = FrameTemplate(frame, ['next_incoming_id', 'delivery_count', 'link_credit'])
+for values in [{}, {'next_incoming_id': 7, 'link_credit': 300}, {'delivery_count': 2 ** 32 - 1}]:
+    rendered = template.render(channel=1, **values)
+    header, frame_data = encode_frame(frame._replace(**values))
+    assert int.from_bytes(rendered[:4], 'big') == len(rendered)
+    assert rendered[6:8] == b'\x00\x01'
+    assert decode_frame(memoryview(rendered)[8:]) == decode_frame(memoryview(frame_data))
+
+frame = DispositionFrame(role=True, first=0, settled=True)
+template = FrameTemplate(frame, ['first', 'settled'])
+for values in [{'first': 99}, {'first': 70000, 'settled': False}]:
+    header, frame_data = encode_frame(frame._replace(**values))
+    assert decode_frame(memoryview(template.render(**values))[8:]) == decode_frame(memoryview(frame_data))
+
+
+def encode_template_playground(run_time):
+
+    SETUP_CODE = '''
+from uamqp._encode import encode_frame, FrameTemplate
+from uamqp.performatives import FlowFrame
+frame = FlowFrame(next_incoming_id=0, incoming_window=100, next_outgoing_id=0, outgoing_window=100, handle=1, delivery_count=0, link_credit=50)
+template = FrameTemplate(frame, ['next_incoming_id', 'delivery_count', 'link_credit'])
+channel = (1).to_bytes(2, 'big')
+    '''
+
+    TEST_CODE_UNOPTIMIZED = '''
+header, frame_data = encode_frame(frame._replace(next_incoming_id=7, link_credit=300))
+header + channel + frame_data
+    '''
+    unoptimized = timeit.timeit(TEST_CODE_UNOPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    TEST_CODE_OPTIMIZED = '''
+template.render(channel=1, next_incoming_id=7, link_credit=300)
+    '''
+    optimized = timeit.timeit(TEST_CODE_OPTIMIZED, setup=SETUP_CODE, number=run_time)
+
+    print(
+        'unoptimized: {}, optimized: {}, optimized - unoptimized: {}, optimized / unoptimized: {}'.format(
+            unoptimized, optimized, optimized - unoptimized, optimized / unoptimized
+        )
+    )
+
+
+encode_template_playground(run_time=1)
+# encode_template_playground(run_time=10_000)
@@ -0,0 +1,556 @@
+/*-------------------------------------------------------------------------
+ * Copyright (c) Microsoft Corporation. All rights reserved.
+ * Licensed under the MIT License. See License.txt in the project root for
+ * license information.
+ *--------------------------------------------------------------------------
+ *
+ * Optional native decoders for the constructor tables of decode_vlatest.
+ *
+ * `decoders(table, composites, uuid_class, slicing)` returns a list of 256 callables with the same
+ * signatures and results as the default Python decoders in `table` (None where there is no
+ * native equivalent): `(buffer) -> (rest, value)` for the slicing table, and
+ * `(buffer, offset) -> (offset, value)` for the offset-cursor table. decode_vlatest installs
+ * them in place of the defaults when this module can be imported.
+ *
+ * Values inside lists, maps and described types are decoded natively when the entry in `table`
+ * for their constructor is still the native decoder, and otherwise by calling that entry, so any
+ * decoder swapped into the table by the `set_*` functions is honoured.
+ *
+ * Build in place with `python setup.py build_ext --inplace`, then run decode_test.py with
+ * REQUIRE_DECODE_ACCEL=1 so that it fails rather than skips the native comparison if the
+ * extension can't be imported.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <string.h>
+
+typedef struct {
+    PyObject_HEAD
+    PyObject *table;        /* The Python list of 256 decoders being accelerated. */
+    PyObject *composites;   /* Descriptor to composite type name. */
+    PyObject *uuid_class;
+    PyObject *natives[256]; /* The native decoders, or NULL. */
+    int slicing;
+} EngineObject;
+
+typedef struct {
+    PyObject_HEAD
+    EngineObject *engine;
+    int constructor;
+} SlotObject;
+
+typedef struct {
+    EngineObject *engine;
+    PyObject *buffer;
+    const unsigned char *data;
+    Py_ssize_t size;
+} Cursor;
+
+static PyObject *empty_tuple;
+static PyObject *bytes_keyword;
+
+static Py_ssize_t decode_element(Cursor *cursor, Py_ssize_t pos, PyObject **value);
+
+static int
+truncated(void)
+{
+    PyErr_SetString(PyExc_IndexError, "Encoded value exceeds the buffer");
+    return -1;
+}
+
+#define NEED(pos, count) \
+    if ((pos) + (Py_ssize_t)(count) > cursor->size || (pos) + (Py_ssize_t)(count) < (pos)) return truncated()
+
+static uint16_t
+read16(const unsigned char *p)
+{
+    return (uint16_t)((p[0] << 8) | p[1]);
+}
+
+static uint32_t
+read32(const unsigned char *p)
+{
+    return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16) | ((uint32_t)p[2] << 8) | (uint32_t)p[3];
+}
+
+static uint64_t
+read64(const unsigned char *p)
+{
+    return ((uint64_t)read32(p) << 32) | (uint64_t)read32(p + 4);
+}
+
+static Py_ssize_t
+decode_list(Cursor *cursor, Py_ssize_t pos, Py_ssize_t count, PyObject **value)
+{
+    PyObject *values, *item;
+    Py_ssize_t i;
+
+    if (count > cursor->size - pos)
+        return truncated();
+    values = PyList_New(count);
+    if (values == NULL)
+        return -1;
+    for (i = 0; i < count; i++) {
+        pos = decode_element(cursor, pos, &item);
+        if (pos < 0) {
+            Py_DECREF(values);
+            return -1;
+        }
+        PyList_SET_ITEM(values, i, item);
+    }
+    *value = values;
+    return pos;
+}
+
+static Py_ssize_t
+decode_map(Cursor *cursor, Py_ssize_t pos, Py_ssize_t count, PyObject **value)
+{
+    PyObject *values, *key, *item;
+    Py_ssize_t i;
+    int failed;
+
+    if (count > cursor->size - pos)
+        return truncated();
+    values = PyDict_New();
+    if (values == NULL)
+        return -1;
+    for (i = 0; i < count / 2; i++) {
+        pos = decode_element(cursor, pos, &key);
+        if (pos < 0) {
+            Py_DECREF(values);
+            return -1;
+        }
+        pos = decode_element(cursor, pos, &item);
+        if (pos < 0) {
+            Py_DECREF(key);
+            Py_DECREF(values);
+            return -1;
+        }
+        failed = PyDict_SetItem(values, key, item);
+        Py_DECREF(key);
+        Py_DECREF(item);
+        if (failed) {
+            Py_DECREF(values);
+            return -1;
+        }
+    }
+    *value = values;
+    return pos;
+}
+
+static Py_ssize_t
+decode_described(Cursor *cursor, Py_ssize_t pos, PyObject **value)
+{
+    const unsigned char *data = cursor->data;
+    PyObject *descriptor, *item, *composite_type;
+    Py_ssize_t length;
+
+    NEED(pos, 1);
+    /* The common descriptor encodings are read inline, as in the Python decoders. */
+    switch (data[pos]) {
+    case 0x53:
+        NEED(pos, 2);
+        descriptor = PyLong_FromLong(data[pos + 1]);
+        pos += 2;
+        break;
+    case 0x80:
+        NEED(pos, 9);
+        descriptor = PyLong_FromUnsignedLongLong(read64(data + pos + 1));
+        pos += 9;
+        break;
+    case 0xa3:
+        NEED(pos, 2);
+        length = data[pos + 1];
+        NEED(pos + 2, length);
+        descriptor = PyBytes_FromStringAndSize((const char *)data + pos + 2, length);
+        pos += 2 + length;
+        break;
+    default:
+        pos = decode_element(cursor, pos, &descriptor);
+        if (pos < 0)
+            return -1;
+    }
+    if (descriptor == NULL)
+        return -1;
+    pos = decode_element(cursor, pos, &item);
+    if (pos < 0) {
+        Py_DECREF(descriptor);
+        return -1;
+    }
+    composite_type = PyDict_GetItemWithError(cursor->engine->composites, descriptor);
+    Py_DECREF(descriptor);
+    if (composite_type != NULL) {
+        *value = PyDict_New();
+        if (*value == NULL || PyDict_SetItem(*value, composite_type, item)) {
+            Py_XDECREF(*value);
+            Py_DECREF(item);
+            return -1;
+        }
+        Py_DECREF(item);
+        return pos;
+    }
+    if (PyErr_Occurred()) {
+        /* Unhashable descriptors are not composites. */
+        if (!PyErr_ExceptionMatches(PyExc_TypeError)) {
+            Py_DECREF(item);
+            return -1;
+        }
+        PyErr_Clear();
+    }
+    *value = item;
+    return pos;
+}
+
+/* Decode the value whose constructor precedes `pos`. */
+static Py_ssize_t
+decode_value(Cursor *cursor, Py_ssize_t pos, int constructor, PyObject **value)
+{
+    const unsigned char *data = cursor->data;
+    Py_ssize_t length;
+    union { uint32_t i; float f; } single;
+    union { uint64_t i; double d; } dual;
+    PyObject *bytes, *kwargs;
+
+    switch (constructor) {
+    case 0x00:
+        if (Py_EnterRecursiveCall(" while decoding a described value"))
+            return -1;
+        pos = decode_described(cursor, pos, value);
+        Py_LeaveRecursiveCall();
+        return pos;
+    case 0x40:
+        *value = Py_NewRef(Py_None);
+        return pos;
+    case 0x41:
+        *value = Py_NewRef(Py_True);
+        return pos;
+    case 0x42:
+        *value = Py_NewRef(Py_False);
+        return pos;
+    case 0x43:
+    case 0x44:
+        *value = PyLong_FromLong(0);
+        return pos;
+    case 0x45:
+        *value = PyList_New(0);
+        return *value ? pos : -1;
+    case 0x50:
+    case 0x52:
+    case 0x53:
+        NEED(pos, 1);
+        *value = PyLong_FromLong(data[pos]);
+        return pos + 1;
+    case 0x51:
+    case 0x54:
+    case 0x55:
+        NEED(pos, 1);
+        *value = PyLong_FromLong((signed char)data[pos]);
+        return pos + 1;
+    case 0x56:
+        NEED(pos, 1);
+        *value = PyBool_FromLong(data[pos] == 1);
+        return pos + 1;
+    case 0x60:
+        NEED(pos, 2);
+        *value = PyLong_FromLong(read16(data + pos));
+        return pos + 2;
+    case 0x61:
+        NEED(pos, 2);
+        *value = PyLong_FromLong((int16_t)read16(data + pos));
+        return pos + 2;
+    case 0x70:
+        NEED(pos, 4);
+        *value = PyLong_FromUnsignedLong(read32(data + pos));
+        return *value ? pos + 4 : -1;
+    case 0x71:
+        NEED(pos, 4);
+        *value = PyLong_FromLong((int32_t)read32(data + pos));
+        return *value ? pos + 4 : -1;
+    case 0x72:
+        NEED(pos, 4);
+        single.i = read32(data + pos);
+        *value = PyFloat_FromDouble(single.f);
+        return *value ? pos + 4 : -1;
+    case 0x80:
+        NEED(pos, 8);
+        *value = PyLong_FromUnsignedLongLong(read64(data + pos));
+        return *value ? pos + 8 : -1;
+    case 0x81:
+    case 0x83:
+        NEED(pos, 8);
+        *value = PyLong_FromLongLong((int64_t)read64(data + pos));
+        return *value ? pos + 8 : -1;
+    case 0x82:
+        NEED(pos, 8);
+        dual.i = read64(data + pos);
+        *value = PyFloat_FromDouble(dual.d);
+        return *value ? pos + 8 : -1;
+    case 0x98:
+        NEED(pos, 16);
+        bytes = PyBytes_FromStringAndSize((const char *)data + pos, 16);
+        if (bytes == NULL)
+            return -1;
+        kwargs = PyDict_New();
+        if (kwargs == NULL || PyDict_SetItem(kwargs, bytes_keyword, bytes)) {
+            Py_XDECREF(kwargs);
+            Py_DECREF(bytes);
+            return -1;
+        }
+        Py_DECREF(bytes);
+        *value = PyObject_Call(cursor->engine->uuid_class, empty_tuple, kwargs);
+        Py_DECREF(kwargs);
+        return *value ? pos + 16 : -1;
+    case 0xa0:
+    case 0xa1:
+    case 0xa3:
+        NEED(pos, 1);
+        length = data[pos];
+        NEED(pos + 1, length);
+        *value = PyBytes_FromStringAndSize((const char *)data + pos + 1, length);
+        return *value ? pos + 1 + length : -1;
+    case 0xb0:
+    case 0xb1:
+    case 0xb3:
+        NEED(pos, 4);
+        length = read32(data + pos);
+        NEED(pos + 4, length);
+        *value = PyBytes_FromStringAndSize((const char *)data + pos + 4, length);
+        return *value ? pos + 4 + length : -1;
+    case 0xc0:
+    case 0xc1:
+        NEED(pos, 2);
+        length = data[pos + 1];
+        pos += 2;
+        break;
+    case 0xd0:
+    case 0xd1:
+        NEED(pos, 8);
+        length = read32(data + pos + 4);
+        pos += 8;
+        break;
+    default:
+        PyErr_Format(PyExc_ValueError, "No native decoder for constructor %d", constructor);
+        return -1;
+    }
+    /* Lists and maps, with `length` the count. */
+    if (Py_EnterRecursiveCall(" while decoding a compound value"))
+        return -1;
+    if (constructor & 0x01)
+        pos = decode_map(cursor, pos, length, value);
+    else
+        pos = decode_list(cursor, pos, length, value);
+    Py_LeaveRecursiveCall();
+    return pos;
+}
+
+/* Decode the value whose constructor is at `pos`, through `table` if it holds a Python decoder. */
+static Py_ssize_t
+decode_element(Cursor *cursor, Py_ssize_t pos, PyObject **value)
+{
+    EngineObject *engine = cursor->engine;
+    PyObject *decoder, *args[2], *result, *rest;
+    Py_ssize_t end;
+    int constructor;
+
+    NEED(pos, 1);
+    constructor = cursor->data[pos];
+    decoder = PyList_GET_ITEM(engine->table, constructor);
+    if (decoder == engine->natives[constructor])
+        return decode_value(cursor, pos + 1, constructor, value);
+
+    if (engine->slicing) {
+        args[0] = PySequence_GetSlice(cursor->buffer, pos + 1, cursor->size);
+        if (args[0] == NULL)
+            return -1;
+        result = PyObject_Vectorcall(decoder, args, 1, NULL);
+        Py_DECREF(args[0]);
+    }
+    else {
+        args[0] = cursor->buffer;
+        args[1] = PyLong_FromSsize_t(pos + 1);
+        if (args[1] == NULL)
+            return -1;
+        result = PyObject_Vectorcall(decoder, args, 2, NULL);
+        Py_DECREF(args[1]);
+    }
+    if (result == NULL)
+        return -1;
+    if (!PyTuple_Check(result) || PyTuple_GET_SIZE(result) != 2) {
+        Py_DECREF(result);
+        PyErr_SetString(PyExc_TypeError, "Decoders must return a 2-tuple");
+        return -1;
+    }
+    rest = PyTuple_GET_ITEM(result, 0);
+    if (engine->slicing) {
+        end = PyObject_Length(rest);
+        end = end < 0 ? -1 : cursor->size - end;
+    }
+    else {
+        end = PyLong_AsSsize_t(rest);
+    }
+    if (end < 0) {
+        Py_DECREF(result);
+        return -1;
+    }
+    *value = Py_NewRef(PyTuple_GET_ITEM(result, 1));
+    Py_DECREF(result);
+    return end;
+}
+
+static PyObject *
+slot_call(PyObject *self, PyObject *const *args, Py_ssize_t nargs)
+{
+    SlotObject *slot = (SlotObject *)self;
+    EngineObject *engine = slot->engine;
+    Py_buffer view;
+    Cursor cursor;
+    PyObject *value, *result;
+    Py_ssize_t pos;
+
+    if (nargs != (engine->slicing ? 1 : 2)) {
+        PyErr_SetString(PyExc_TypeError, engine->slicing ? "expected (buffer)" : "expected (buffer, offset)");
+        return NULL;
+    }
+    if (engine->slicing) {
+        pos = 0;
+    }
+    else {
+        pos = PyLong_AsSsize_t(args[1]);
+        if (pos == -1 && PyErr_Occurred())
+            return NULL;
+    }
+    if (PyObject_GetBuffer(args[0], &view, PyBUF_SIMPLE) < 0)
+        return NULL;
+    cursor.engine = engine;
+    cursor.buffer = args[0];
+    cursor.data = (const unsigned char *)view.buf;
+    cursor.size = view.len;
+    if (pos < 0 || pos > cursor.size) {
+        PyBuffer_Release(&view);
+        truncated();
+        return NULL;
+    }
+    pos = decode_value(&cursor, pos, slot->constructor, &value);
+    PyBuffer_Release(&view);
+    if (pos < 0)
+        return NULL;
+    if (engine->slicing) {
+        PyObject *rest = PySequence_GetSlice(args[0], pos, cursor.size);
+        if (rest == NULL) {
+            Py_DECREF(value);
+            return NULL;
+        }
+        result = PyTuple_Pack(2, rest, value);
+        Py_DECREF(rest);
+    }
+    else {
+        PyObject *end = PyLong_FromSsize_t(pos);
+        if (end == NULL) {
+            Py_DECREF(value);
+            return NULL;
+        }
+        result = PyTuple_Pack(2, end, value);
+        Py_DECREF(end);
+    }
+    Py_DECREF(value);
+    return result;
+}
+
+static PyMethodDef slot_def = {"decode", (PyCFunction)(void (*)(void))slot_call, METH_FASTCALL, NULL};
+
+static PyTypeObject EngineType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "_decode_accel.Engine",
+    .tp_basicsize = sizeof(EngineObject),
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+};
+
+static PyTypeObject SlotType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "_decode_accel.Slot",
+    .tp_basicsize = sizeof(SlotObject),
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+};
+
+static const unsigned char native_constructors[] = {
+    0x00, 0x40, 0x41, 0x42, 0x43, 0x44, 0x45, 0x50, 0x51, 0x52, 0x53, 0x54, 0x55, 0x56, 0x60, 0x61,
+    0x70, 0x71, 0x72, 0x80, 0x81, 0x82, 0x83, 0x98, 0xa0, 0xa1, 0xa3, 0xb0, 0xb1, 0xb3,
+    0xc0, 0xc1, 0xd0, 0xd1,
+};
+
+static PyObject *
+decoders(PyObject *module, PyObject *args)
+{
+    PyObject *table, *composites, *uuid_class, *result;
+    EngineObject *engine;
+    SlotObject *slot;
+    int slicing = 0;
+    size_t i;
+
+    if (!PyArg_ParseTuple(args, "O!O!O|p:decoders", &PyList_Type, &table, &PyDict_Type, &composites,
+                          &uuid_class, &slicing))
+        return NULL;
+    if (PyList_GET_SIZE(table) != 256) {
+        PyErr_SetString(PyExc_ValueError, "The table must have 256 entries");
+        return NULL;
+    }
+    engine = PyObject_New(EngineObject, &EngineType);
+    if (engine == NULL)
+        return NULL;
+    engine->table = Py_NewRef(table);
+    engine->composites = Py_NewRef(composites);
+    engine->uuid_class = Py_NewRef(uuid_class);
+    engine->slicing = slicing;
+    memset(engine->natives, 0, sizeof(engine->natives));
+
+    result = PyList_New(256);
+    if (result == NULL)
+        return NULL;
+    for (i = 0; i < 256; i++)
+        PyList_SET_ITEM(result, i, Py_NewRef(Py_None));
+    for (i = 0; i < sizeof(native_constructors); i++) {
+        PyObject *function;
+
+        slot = PyObject_New(SlotObject, &SlotType);
+        if (slot == NULL) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        slot->engine = (EngineObject *)Py_NewRef(engine);
+        slot->constructor = native_constructors[i];
+        function = PyCFunction_NewEx(&slot_def, (PyObject *)slot, NULL);
+        Py_DECREF(slot);
+        if (function == NULL) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        /* The engine keeps its decoders alive for as long as the process. */
+        engine->natives[native_constructors[i]] = Py_NewRef(function);
+        PyList_SetItem(result, native_constructors[i], function);
+    }
+    Py_DECREF(engine);
+    return result;
+}
+
+static PyMethodDef module_methods[] = {
+    {"decoders", decoders, METH_VARARGS,
+     "decoders(table, composites, uuid_class, slicing=False)\n\n"
+     "Return the native equivalents of the default decoders in `table`."},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef module_def = {
+    PyModuleDef_HEAD_INIT, "_decode_accel", "Native decoders for decode_vlatest.", -1, module_methods,
+};
+
+PyMODINIT_FUNC
+PyInit__decode_accel(void)
+{
+    if (PyType_Ready(&EngineType) < 0 || PyType_Ready(&SlotType) < 0)
+        return NULL;
+    empty_tuple = PyTuple_New(0);
+    bytes_keyword = PyUnicode_InternFromString("bytes");
+    if (empty_tuple == NULL || bytes_keyword == NULL)
+        return NULL;
+    return PyModule_Create(&module_def);
+}
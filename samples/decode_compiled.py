@@ -0,0 +1,193 @@
+#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+#--------------------------------------------------------------------------
+# pylint: disable=import-error, exec-used
+"""Per-performative frame decoders generated from the FIELD definitions in pyamqp1.
+
+Rather than dispatching every field through the constructor table, each performative gets a
+decoder whose body is unrolled field by field, with the constructors expected for the field's
+type checked and decoded inline. Any other constructor falls back to the generic dispatch,
+so the results are identical to `decode_vlatest.decode_frame_at`.
+"""
+
+import logging
+from typing import List, Tuple, Any, Callable  # pylint: disable=unused-import
+
+from pyamqp1.amqptypes import AMQPTypes, FieldDefinition
+from pyamqp1 import performatives
+from decode_vlatest import (
+    _DECODE_AT_CONSTRUCTOR,
+    c_signed_int,
+    c_unsigned_short,
+    c_unsigned_int,
+    c_unsigned_long_long
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_PERFORMATIVES = (
+    performatives.OpenFrame,
+    performatives.BeginFrame,
+    performatives.AttachFrame,
+    performatives.FlowFrame,
+    performatives.TransferFrame,
+    performatives.DispositionFrame,
+    performatives.DetachFrame,
+    performatives.EndFrame,
+    performatives.CloseFrame,
+    performatives.SASLMechanism,
+    performatives.SASLInit,
+    performatives.SASLChallenge,
+    performatives.SASLResponse,
+    performatives.SASLOutcome,
+)
+
+# Inline decoding of the expected constructors, as (constructor, statements). `offset` is the
+# position of the constructor and `{v}` the variable the field is decoded into.
+_NULL = ((0x40, ("{v} = None", "offset += 1")),)
+_INLINE_BY_TYPE = {
+    AMQPTypes.boolean: (
+        (0x41, ("{v} = True", "offset += 1")),
+        (0x42, ("{v} = False", "offset += 1")),
+        (0x56, ("{v} = buffer[offset + 1] == 1", "offset += 2")),
+    ),
+    AMQPTypes.ubyte: (
+        (0x50, ("{v} = buffer[offset + 1]", "offset += 2")),
+    ),
+    AMQPTypes.ushort: (
+        (0x60, ("{v} = c_unsigned_short.unpack_from(buffer, offset + 1)[0]", "offset += 3")),
+    ),
+    AMQPTypes.uint: (
+        (0x52, ("{v} = buffer[offset + 1]", "offset += 2")),
+        (0x43, ("{v} = 0", "offset += 1")),
+        (0x70, ("{v} = c_unsigned_int.unpack_from(buffer, offset + 1)[0]", "offset += 5")),
+    ),
+    AMQPTypes.ulong: (
+        (0x53, ("{v} = buffer[offset + 1]", "offset += 2")),
+        (0x44, ("{v} = 0", "offset += 1")),
+        (0x80, ("{v} = c_unsigned_long_long.unpack_from(buffer, offset + 1)[0]", "offset += 9")),
+    ),
+    AMQPTypes.binary: (
+        (0xa0, ("end = offset + 2 + buffer[offset + 1]", "{v} = buffer[offset + 2:end].tobytes()", "offset = end")),
+    ),
+}
+# Restricted types are decoded as their source type.
+_INLINE_BY_TYPE.update({
+    FieldDefinition.role: _INLINE_BY_TYPE[AMQPTypes.boolean],
+    FieldDefinition.sender_settle_mode: _INLINE_BY_TYPE[AMQPTypes.ubyte],
+    FieldDefinition.receiver_settle_mode: _INLINE_BY_TYPE[AMQPTypes.ubyte],
+    FieldDefinition.sasl_code: _INLINE_BY_TYPE[AMQPTypes.ubyte],
+    FieldDefinition.handle: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.seconds: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.milliseconds: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.delivery_number: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.transfer_number: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.sequence_no: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.message_format: _INLINE_BY_TYPE[AMQPTypes.uint],
+    FieldDefinition.delivery_tag: _INLINE_BY_TYPE[AMQPTypes.binary],
+})
+
+
+def _decode_fields(buffer, offset, count):
+    # type: (memoryview, int, int) -> Tuple[int, List[Any]]
+    fields = [None] * count
+    for i in range(count):
+        offset, fields[i] = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+    return offset, fields
+
+
+def _field_source(field, variable):
+    # type: (FIELD, str) -> List[str]
+    inline = () if field.multiple else _INLINE_BY_TYPE.get(field.type, ())
+    lines = ["    constructor = buffer[offset]"]
+    keyword = "if"
+    for constructor, statements in inline + _NULL:
+        lines.append("    {} constructor == {}:".format(keyword, hex(constructor)))
+        lines.extend("        " + statement.format(v=variable) for statement in statements)
+        keyword = "elif"
+    lines.append("    else:")
+    lines.append("        offset, {} = _DECODE_AT_CONSTRUCTOR[constructor](buffer, offset + 1)".format(variable))
+    return lines
+
+
+def _decoder_name(performative):
+    # type: (Performative) -> str
+    return "_decode_{}".format(performative.NAME.lower().replace("-", "_"))
+
+
+def generate_source(performative):
+    # type: (Performative) -> str
+    """Return the source of the field list decoder for `performative`.
+
+    The generated function takes `(buffer, offset, count)`, with `offset` at the first field and
+    `count` the number of fields in the list, and returns `(offset, fields)`.
+    """
+    definition = performative.DEFINITION
+    total = len(definition)
+    variables = ["v{}".format(index) for index in range(total)]
+    lines = [
+        "def {}(buffer, offset, count):".format(_decoder_name(performative)),
+        "    if count > {}:".format(total),
+        "        return _decode_fields(buffer, offset, count)",
+        "    if count == 0:",
+        "        return offset, []",
+    ]
+    for index, field in enumerate(definition):
+        lines.extend(_field_source(field, variables[index]))
+        if index < total - 1:
+            lines.append("    if count == {}:".format(index + 1))
+        lines.append("        return offset, [{}]".format(", ".join(variables[:index + 1])))
+    # The final return is unconditional.
+    lines[-1] = lines[-1][4:]
+    return "\n".join(lines) + "\n"
+
+
+def compile_decoder(performative):
+    # type: (Performative) -> Callable[[memoryview, int, int], Tuple[int, List[Any]]]
+    """Generate and compile the field list decoder for `performative`."""
+    namespace = {
+        "_decode_fields": _decode_fields,
+        "_DECODE_AT_CONSTRUCTOR": _DECODE_AT_CONSTRUCTOR,
+        "c_unsigned_short": c_unsigned_short,
+        "c_unsigned_int": c_unsigned_int,
+        "c_unsigned_long_long": c_unsigned_long_long,
+    }
+    name = _decoder_name(performative)
+    exec(compile(generate_source(performative), "<{}>".format(name), "exec"), namespace)
+    return namespace[name]
+
+
+_DECODE_BY_PERFORMATIVE = [_decode_fields] * 256  # type: List[Callable[memoryview, int, int]]
+for _performative in _PERFORMATIVES:
+    _DECODE_BY_PERFORMATIVE[_performative.CODE] = compile_decoder(_performative)
+
+
+def decode_frame(data, offset=0):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    """Decode the performative starting at `offset`, using the compiled decoder for its type."""
+    # Ignore the first two bytes, they will always be the constructors for
+    # described type then ulong.
+    frame_type = data[offset + 2]
+    if data[offset + 3] == 0xd0:
+        # list32 0xd0: size then count
+        count = c_signed_int.unpack_from(data, offset + 8)[0]
+        offset += 12
+    elif data[offset + 3] == 0x45:
+        # list0 0x45: no fields
+        count = 0
+        offset += 4
+    else:
+        # list8 0xc0: size then count
+        count = data[offset + 5]
+        offset += 6
+    offset, fields = _DECODE_BY_PERFORMATIVE[frame_type](data, offset, count)
+    if frame_type == 20:
+        fields.append(data[offset:])
+    return frame_type, fields
+
+
+if __name__ == '__main__':
+    for _performative in _PERFORMATIVES:
+        print(generate_source(_performative))
@@ -1,6 +1,9 @@
 import os
 from decode_v1 import decode_frame as decode1
 from decode_vlatest import decode_frame as decode2
+from decode_vlatest import decode_frame_at as decode3
+from decode_vlatest import set_native_decoding, set_string_decoding
+from decode_compiled import decode_frame as decode4
 
 frame_bytes = b'\x00S\x11\xc0\x15\x08@Cp\x00\x01\x00\x00p\x00\x01\x00\x00p\xff\xff\xff\xff@@@'
 
@@ -13,8 +16,364 @@ t = timeit.timeit(lambda: decode1(frame_bytes), number=15000)
 print(f"Time to decode 15k frames v1: {t}")
 t = timeit.timeit(lambda: decode2(memoryview(frame_bytes)), number=15000)
 print(f"Time to decode 15k frames v2: {t}")
+t = timeit.timeit(lambda: decode3(memoryview(frame_bytes)), number=15000)
+print(f"Time to decode 15k frames v2 (offset cursor): {t}")
+t = timeit.timeit(lambda: decode4(memoryview(frame_bytes)), number=15000)
+print(f"Time to decode 15k frames v2 (compiled): {t}")
 
 
+### primitive coverage, checked against both decoder engines
+
+from decimal import Decimal
+from uuid import UUID
+from decode_vlatest import _DECODE_BY_CONSTRUCTOR, _DECODE_AT_CONSTRUCTOR
+
+# Every constructor defined by AMQP.
+amqp_constructors = {
+    0x00, 0x40, 0x41, 0x42, 0x43, 0x44, 0x45, 0x50, 0x51, 0x52, 0x53, 0x54, 0x55, 0x56, 0x60, 0x61,
+    0x70, 0x71, 0x72, 0x73, 0x74, 0x80, 0x81, 0x82, 0x83, 0x84, 0x94, 0x98, 0xa0, 0xa1, 0xa3, 0xb0,
+    0xb1, 0xb3, 0xc0, 0xc1, 0xd0, 0xd1, 0xe0, 0xf0,
+}
+
+# Encoded by hand, as `_encode` has no encoder for these types.
+primitives = [
+    (b'\x73\x00\x00\x00\x41', 'A'),
+    (b'\x74\x32\x80\x00\x0f', Decimal('15')),
+    (b'\x84\x31\xa0\x00\x00\x00\x00\x00\x0f', Decimal('1.5')),
+    (b'\x94\x30\x3e' + b'\x00' * 13 + b'\x0f', Decimal('1.5')),
+]
+
+try:
+    from uamqp._encode import encode_value
+    from uamqp.types import AMQPTypes, TYPE, VALUE
+except ImportError:
+    print("The uamqp encoder is not installed, skipping the round trip of the encodable primitives")
+else:
+    from decode_vlatest import set_string_decoding
+
+    def encode_typed(amqp_type, value, **kwargs):
+        output = bytearray()
+        encode_value(output, {TYPE: amqp_type, VALUE: value}, **kwargs)
+        return bytes(output)
+
+    # As (type, value, encoder keyword arguments), covering every encoding of each type.
+    encodable = [
+        (AMQPTypes.null, None, {}),
+        (AMQPTypes.boolean, True, {'with_constructor': False}),
+        (AMQPTypes.boolean, False, {'with_constructor': False}),
+        (AMQPTypes.boolean, True, {}),
+        (AMQPTypes.ubyte, 255, {}),
+        (AMQPTypes.byte, -1, {}),
+        (AMQPTypes.ushort, 256, {}),
+        (AMQPTypes.short, -2, {}),
+        (AMQPTypes.uint, 0, {}),
+        (AMQPTypes.uint, 7, {}),
+        (AMQPTypes.uint, 65536, {}),
+        (AMQPTypes.int, -7, {}),
+        (AMQPTypes.int, -70000, {}),
+        (AMQPTypes.ulong, 0, {}),
+        (AMQPTypes.ulong, 7, {}),
+        (AMQPTypes.ulong, 2 ** 32, {}),
+        (AMQPTypes.long, -7, {}),
+        (AMQPTypes.long, -2 ** 40, {}),
+        (AMQPTypes.float, 1.5, {}),
+        (AMQPTypes.double, 1.5, {}),
+        (AMQPTypes.timestamp, 1000, {}),
+        (AMQPTypes.uuid, UUID(int=1), {}),
+        (AMQPTypes.binary, b'ab', {}),
+        (AMQPTypes.binary, b'x' * 300, {}),
+        (AMQPTypes.string, 'ab', {}),
+        (AMQPTypes.string, 'x' * 300, {}),
+        (AMQPTypes.symbol, 'ab', {}),
+        (AMQPTypes.symbol, 'x' * 300, {}),
+        (AMQPTypes.list, [], {}),
+        (AMQPTypes.list, [True, 'a', None], {}),
+        (AMQPTypes.list, [b'x' * 300], {}),
+        (AMQPTypes.map, {'k': None}, {}),
+        (AMQPTypes.map, {'k': 'x' * 300}, {}),
+        (AMQPTypes.array, [{TYPE: AMQPTypes.ubyte, VALUE: 1}, {TYPE: AMQPTypes.ubyte, VALUE: 2}], {}),
+        (AMQPTypes.array, [{TYPE: AMQPTypes.string, VALUE: 'x' * 300}], {}),
+    ]
+    # The round trip decodes strings and symbols to str, to compare them with the encoded values.
+    set_string_decoding(True)
+    for amqp_type, value, kwargs in encodable:
+        data = memoryview(encode_typed(amqp_type, value, **kwargs))
+        if amqp_type == AMQPTypes.array:
+            value = [element[VALUE] for element in value]
+        assert _DECODE_BY_CONSTRUCTOR[data[0]](data[1:])[1] == value, (amqp_type, value)
+        assert _DECODE_AT_CONSTRUCTOR[data[0]](data, 1) == (len(data), value), (amqp_type, value)
+    set_string_decoding(False)
+
+    described = encode_typed(AMQPTypes.described, ({TYPE: AMQPTypes.ulong, VALUE: 0x24}, {TYPE: AMQPTypes.list, VALUE: []}))
+    primitives += [(encode_typed(amqp_type, value, **kwargs), None) for amqp_type, value, kwargs in encodable]
+    primitives.append((described, {'accepted': []}))
+    assert {encoded[0] for encoded, _ in primitives} == amqp_constructors
+
+for encoded, expected in primitives:
+    if expected is None:
+        # Checked by the round trip.
+        continue
+    data = memoryview(encoded)
+    assert _DECODE_BY_CONSTRUCTOR[encoded[0]](data[1:])[1] == expected, encoded
+    assert _DECODE_AT_CONSTRUCTOR[encoded[0]](data, 1) == (len(encoded), expected), encoded
+# Every other constructor is reported as invalid rather than failing with a TypeError.
+for constructor in set(range(256)) - amqp_constructors:
+    try:
+        _DECODE_AT_CONSTRUCTOR[constructor](memoryview(bytes([constructor, 0])), 1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Constructor {} was decoded".format(hex(constructor)))
+
+
+### strict decoding of arrays, whose elements share the constructor that precedes them
+
+from decode_vlatest import _decode_strict_at, DecodeError
+
+arrays = [
+    (b'\xe0\x0a\x02\xa3\x03abc\x03def', [b'abc', b'def']),
+    (b'\xe0\x0a\x02\xa1\x03abc\x03def', [b'abc', b'def']),
+    (b'\xe0\x0a\x02\xa0\x03abc\x03def', [b'abc', b'def']),
+    (b'\xf0\x00\x00\x00\x13\x00\x00\x00\x02\xb3\x00\x00\x00\x03abc\x00\x00\x00\x03def', [b'abc', b'def']),
+    (b'\xe0\x0a\x02\xc0\x03\x02\x41\x42\x03\x01\x50\x07', [[True, False], [7]]),
+    (b'\xe0\x0b\x02\xc1\x03\x02\x41\x42\x04\x02\x50\x07\x40', [{True: False}, {7: None}]),
+    (b'\xe0\x0c\x02\xe0\x04\x02\x50\x01\x02\x04\x02\x50\x03\x04', [[1, 2], [3, 4]]),
+    # Empty arrays, with and without the element constructor.
+    (b'\xe0\x01\x00', []),
+    (b'\xe0\x02\x00\xa1', []),
+    (b'\xf0\x00\x00\x00\x04\x00\x00\x00\x00', []),
+    (b'\xf0\x00\x00\x00\x05\x00\x00\x00\x00\xa1', []),
+]
+for encoded, expected in arrays:
+    assert _decode_strict_at(memoryview(encoded), 0) == (len(encoded), expected), encoded
+    assert _DECODE_AT_CONSTRUCTOR[encoded[0]](memoryview(encoded), 1) == (len(encoded), expected), encoded
+    rest, value = _DECODE_BY_CONSTRUCTOR[encoded[0]](memoryview(encoded)[1:])
+    assert (len(rest), value) == (0, expected), encoded
+for encoded in [
+        b'\xe0\x0a\x02\xa3\x03abc\x04def',  # the second element overruns the array
+        b'\xe0\x0a\x02\xc0\x03\x02\x41\x42\x03\x05\x50\x07',  # the second element count exceeds its size
+]:
+    try:
+        _decode_strict_at(memoryview(encoded), 0)
+    except DecodeError:
+        pass
+    else:
+        raise AssertionError("Malformed array {} was decoded".format(encoded))
+
+
+### strict decoding of values and sections that are not otherwise checked
+
+from decode_vlatest import decode_payload_at
+
+for encoded in [
+        b'\x73\x80\x00\x00\x00',  # a char beyond the unicode range
+        b'\xe0\x0a\x02\x73\x00\x00\x00\x61\xff\xff\xff\xff',  # as an array element
+]:
+    try:
+        _decode_strict_at(memoryview(encoded), 0)
+    except DecodeError:
+        pass
+    else:
+        raise AssertionError("Invalid char {} was decoded".format(encoded))
+for encoded, sections in [
+        (b'\x00\x53\x75\xa0\x03abc\x00\x53\x79\x01', None),  # an unknown section with an invalid constructor
+        (b'\x00\x53\x70\x45\x00\x53\x73\xc0', {0x75}),  # a truncated section that is not decoded
+]:
+    try:
+        decode_payload_at(memoryview(encoded), sections=sections, strict=True)
+    except DecodeError:
+        pass
+    else:
+        raise AssertionError("Malformed payload {} was decoded".format(encoded))
+
+
+### lazy uuids, as a drop-in replacement for uuid.UUID
+
+import copy
+import pickle
+from decode_vlatest import LazyUUID
+
+lazy = LazyUUID(UUID(int=5).bytes)
+for duplicate in (copy.copy(lazy), copy.deepcopy(lazy), pickle.loads(pickle.dumps(lazy))):
+    assert type(duplicate) is LazyUUID and duplicate == lazy
+assert lazy < UUID(int=7) and UUID(int=7) > lazy and lazy <= LazyUUID(UUID(int=5).bytes)
+assert sorted([UUID(int=7), lazy, UUID(int=1)]) == [UUID(int=1), lazy, UUID(int=7)]
+
+
+### native decoders, checked against the pure Python ones over the whole corpus
+
+import struct
+from decode_vlatest import decode_payload, decode_payload_at
+
+nested = [
+    (b'\xd0\x00\x00\x00\x16\x00\x00\x00\x03\x45\xc1\x0a\x02\xa3\x01k\xe0\x04\x02\x50\x01\x02\xd1\x00\x00\x00\x04\x00\x00\x00\x00',
+     [[], {b'k': [1, 2]}, {}]),
+    (b'\xc0\x0e\x02\x00\x53\x24\x45\x00\x53\x25\xc0\x04\x02\x52\x01\x40', [{'accepted': []}, {'rejected': [1, None]}]),
+    (b'\xc1\x0e\x02\x00\xa3\x04name\xc0\x03\x01\xa1\x00\xa1\x00', {b'': [b'']}),
+]
+payloads = [
+    b'\x00Sp\xc0\x04\x02AP\x04\x00Sr\xc14\x04\xa3\x15x-opt-sequence-numberT\x05\xa3\x13x-opt-partition-key\xa1\x03pk1'
+    b'\x00Ss\xc0\x1e\x0c\xa0\x03id1@\xa1\x03foo@@@@@@\x83\x00\x00\x01t\x87n\x80\x00@R\x03\x00St\xc1\x10\x04\xa1\x03key\xa1\x03val'
+    b'\xa1\x01nT\x03\x00Su\xa0\x05hello\x00Su\xa0\x05world\x00Sx\xc1\x10\x02\xa3\x06x-foot\xc0\x05\x02T\x01T\x02',
+    b'\x00Sv\xc0\x07\x03T\x01\xa1\x01a@\x00Sv\xc0\x0c\x01\xc1\t\x02\xa0\x01k\xc0\x03\x01V\x01',
+    b'\x00Sw\xc1#\x02\xa1\x06nested\xc0\x18\x02T\x01\xc1\x13\x02\xa1\x01m\xc0\r\x02\xa0\x01x\x82@\x04\x00\x00\x00\x00\x00\x00'
+    b'\x00Sq\xc1\x15\x02\xa3\x10x-opt-lock-tokenT\x07',
+]
+
+
+def _decode_or_error(decoder, *args):
+    try:
+        return decoder(*args)
+    except (IndexError, struct.error):
+        # Either engine may report a truncated value as either of these.
+        return IndexError
+    except Exception as e:  # pylint: disable=broad-except
+        return type(e)
+
+
+def decode_corpus():
+    results = []
+    for encoded, _ in primitives + arrays + nested:
+        # Every truncation of the value too, to cover the bounds checks.
+        for end in range(1, len(encoded) + 1):
+            data = memoryview(encoded[:end])
+            truncated = end < len(encoded)
+            results.append((truncated, _decode_or_error(lambda d: _DECODE_BY_CONSTRUCTOR[d[0]](d[1:])[1], data)))
+            results.append((truncated, _decode_or_error(_DECODE_AT_CONSTRUCTOR[encoded[0]], data, 1)))
+    for encoded in payloads:
+        results.append((False, decode_payload(memoryview(encoded))))
+        results.append((False, decode_payload_at(memoryview(encoded))))
+    results.append((False, decode2(memoryview(frame_bytes))))
+    results.append((False, decode3(memoryview(frame_bytes))))
+    return results
+
+
+try:
+    set_native_decoding(True)
+except ImportError:
+    if os.environ.get('REQUIRE_DECODE_ACCEL'):
+        raise AssertionError("REQUIRE_DECODE_ACCEL is set but the _decode_accel extension can't be imported")
+    print("The _decode_accel extension is not built, skipping the pure Python comparison "
+          "(set REQUIRE_DECODE_ACCEL=1 to fail instead)")
+else:
+    # With string decoding enabled, the native decoders call back into the Python string decoders
+    # swapped into the tables.
+    for string_decoding in (False, True):
+        set_string_decoding(string_decoding)
+        set_native_decoding(True)
+        native_results = decode_corpus()
+        set_native_decoding(False)
+        python_results = decode_corpus()
+        assert len(native_results) == len(python_results)
+        for (truncated, native_result), (_, python_result) in zip(native_results, python_results):
+            # The unchecked Python decoders slice a truncated binary, string or symbol short, where the
+            # native ones check the bounds.
+            assert native_result == python_result or (truncated and native_result is IndexError), (
+                native_result, python_result)
+    set_string_decoding(False)
+    t = timeit.timeit(lambda: decode3(memoryview(frame_bytes)), number=15000)
+    print(f"Time to decode 15k frames v2 (offset cursor, pure Python): {t}")
+    set_native_decoding(True)
+
+
+### compiled frame decoders, checked against decode_frame_at
+
+from decode_compiled import _PERFORMATIVES
+
+
+def performative_frames(code, fields, payload=b''):
+    # The fields as list0, list8 and list32, e.g. from a peer that does not use the smallest encoding.
+    encoded = b''.join(fields)
+    descriptor = b'\x00\x53' + bytes([code])
+    if not fields:
+        yield descriptor + b'\x45' + payload
+    if len(encoded) < 255:
+        yield descriptor + b'\xc0' + bytes([len(encoded) + 1, len(fields)]) + encoded + payload
+    yield descriptor + b'\xd0' + struct.pack('>II', len(encoded) + 4, len(fields)) + encoded + payload
+
+
+for performative in _PERFORMATIVES:
+    payload = b'payload' if performative.CODE == 0x14 else b''
+    # Every value of the corpus in every field, including one beyond the definition.
+    for encoded, _ in primitives + arrays + nested:
+        for index in range(len(performative.DEFINITION) + 1):
+            for frame in performative_frames(performative.CODE, [b'\x40'] * index + [encoded], payload):
+                compiled_result = _decode_or_error(decode4, memoryview(frame))
+                assert compiled_result == _decode_or_error(decode3, memoryview(frame)), frame
+    for frame in performative_frames(performative.CODE, [], payload):
+        assert decode4(memoryview(frame)) == decode3(memoryview(frame)), frame
+assert decode4(memoryview(frame_bytes)) == decode3(memoryview(frame_bytes))
+
+
+### incremental frame parsing, with the stream split at every offset
+
+from frame_reader import FrameReader
+
+
+def amqp_frame(channel, body, frame_type=0):
+    return struct.pack('>IBBH', 8 + len(body), 2, frame_type, channel) + body
+
+
+transfer_body = b'\x00\x53\x14\xc0\x07\x03\x52\x01\x43\xa0\x01t' + b'payload' * 50
+stream = (
+    b'AMQP\x03\x01\x00\x00'  # SASL protocol header
+    + b'AMQP\x00\x01\x00\x00'  # AMQP protocol header
+    + amqp_frame(0, frame_bytes)
+    + b'\x00\x00\x00\x08\x02\x00\x00\x00'  # heartbeat
+    + amqp_frame(3, transfer_body)
+    + amqp_frame(1, b'\x00\x53\x17\x45')  # end without an error, as list0
+)
+expected_frames = [
+    (0, 0, b'AMQP\x03\x01\x00\x00'),
+    (0, 0, b'AMQP\x00\x01\x00\x00'),
+    (0,) + decode3(memoryview(frame_bytes)),
+    (0, 1, b'EMPTY'),
+    (3,) + decode3(memoryview(transfer_body)),
+    (1, 0x17, []),
+]
+
+
+def read_frames(reader, chunks):
+    # The frames are compared once every chunk has been fed, so the payload views yielded before
+    # the buffer was regrown must still be valid.
+    received = []
+    for chunk in chunks:
+        reader.feed(chunk)
+        received.extend(reader.frames())
+    assert len(reader) == 0
+    return received
+
+
+for split in range(len(stream) + 1):
+    assert read_frames(FrameReader(), [stream[:split], stream[split:]]) == expected_frames, split
+# One byte at a time, starting from a buffer smaller than a frame header.
+assert read_frames(FrameReader(buffer_size=4), [stream[i:i + 1] for i in range(len(stream))]) == expected_frames
+for read_size in (1, 7, 64):
+    # Received straight into the buffer, as by sock.recv_into.
+    reader = FrameReader(buffer_size=16)
+    received = []
+    for start in range(0, len(stream), read_size):
+        chunk = stream[start:start + read_size]
+        buffer = reader.get_buffer(read_size)
+        buffer[:len(chunk)] = chunk
+        reader.buffer_updated(len(chunk))
+        received.extend(reader.frames())
+    assert received == expected_frames, read_size
+
+reader = FrameReader()
+reader.feed(stream[:-1])
+assert len(list(reader.frames())) == len(expected_frames) - 1
+assert len(reader) == len(amqp_frame(1, b'\x00\x53\x17\x45')) - 1
+for invalid in [b'\x00\x00\x00\x07\x02\x00\x00\x00', amqp_frame(0, b'\x00' * 100)]:
+    reader = FrameReader(max_frame_size=64)
+    reader.feed(invalid)
+    try:
+        list(reader.frames())
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Frame {} with an invalid size was read".format(invalid))
+
 
 ### running the profiler in code
 
@@ -29,8 +388,18 @@ def decode_lots_of_frames2(n):
     for _ in range(n):
         decode2(memview_bytes)
 
+def decode_lots_of_frames3(n):
+    memview_bytes = memoryview(frame_bytes)
+    for _ in range(n):
+        decode3(memview_bytes)
+
+def decode_lots_of_frames4(n):
+    memview_bytes = memoryview(frame_bytes)
+    for _ in range(n):
+        decode4(memview_bytes)
+
 if __name__ == '__main__':
-    for index, decoder in enumerate([decode_lots_of_frames1, decode_lots_of_frames2]):
+    for index, decoder in enumerate([decode_lots_of_frames1, decode_lots_of_frames2, decode_lots_of_frames3, decode_lots_of_frames4]):
         profile = cProfile.Profile()
         try:
             profile.enable()
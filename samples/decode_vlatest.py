@@ -5,15 +5,32 @@
 #--------------------------------------------------------------------------
 # pylint: disable=redefined-builtin, import-error
 
+import sys
+import array
 import struct
 import uuid
 import logging
-from typing import List, Union, Tuple, Dict, Callable  # pylint: disable=unused-import
+import datetime
+import decimal
+from collections import namedtuple
+from functools import cached_property
+from typing import List, Union, Tuple, Dict, Callable, Optional, Any, Iterable, AbstractSet, Sequence  # pylint: disable=unused-import
 
 
 from pyamqp2.message import Message, Header, Properties
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import _decode_accel
+except ImportError:
+    _decode_accel = None
+
 _LOGGER = logging.getLogger(__name__)
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
 _HEADER_PREFIX = memoryview(b'AMQP')
 _COMPOSITES = {
     35: 'received',
@@ -21,7 +38,22 @@ _COMPOSITES = {
     37: 'rejected',
     38: 'released',
     39: 'modified',
+    40: 'source',
+    41: 'target',
+    29: 'error',
 }
+# Symbolic descriptors share the table, keyed by the raw symbol bytes (or str when
+# symbols are decoded as strings, see `set_string_decoding`).
+for _name in list(_COMPOSITES.values()):
+    _COMPOSITES['amqp:{}:list'.format(_name)] = _name
+    _COMPOSITES['amqp:{}:list'.format(_name).encode()] = _name
+_SYMBOL_CACHE = {}  # type: Dict[bytes, str]
+_SYMBOL_CACHE_SIZE = 1024
+
+DEFAULT_MAX_DEPTH = 64
+DEFAULT_MAX_ELEMENTS = 1024 * 1024
+_MAX_DEPTH = DEFAULT_MAX_DEPTH
+_MAX_ELEMENTS = DEFAULT_MAX_ELEMENTS
 
 c_unsigned_char = struct.Struct('>B')
 c_signed_char = struct.Struct('>b')
@@ -34,6 +66,46 @@ c_unsigned_long_long = struct.Struct('>Q')
 c_signed_long_long = struct.Struct('>q')
 c_float = struct.Struct('>f')
 c_double = struct.Struct('>d')
+c_unsigned_long_long_pair = struct.Struct('>QQ')
+
+# Fixed width array element constructors, as (array typecode, element width).
+_FIXED_ARRAY_ELEMENTS = [None] * 256  # type: List[Optional[Tuple[str, int]]]
+_FIXED_ARRAY_ELEMENTS[0x70] = ('I', 4)  # uint
+_FIXED_ARRAY_ELEMENTS[0x71] = ('i', 4)  # int
+_FIXED_ARRAY_ELEMENTS[0x72] = ('f', 4)  # float
+_FIXED_ARRAY_ELEMENTS[0x80] = ('Q', 8)  # ulong
+_FIXED_ARRAY_ELEMENTS[0x81] = ('q', 8)  # long
+_FIXED_ARRAY_ELEMENTS[0x82] = ('d', 8)  # double
+_FIXED_ARRAY_ELEMENTS[0x83] = ('q', 8)  # timestamp
+
+# IEEE 754 decimal formats, in the binary integer decimal encoding used by AMQP, as
+# (width in bits, exponent continuation bits, exponent bias, precision in digits).
+_DECIMAL32 = (32, 8, 101, 7)
+_DECIMAL64 = (64, 10, 398, 16)
+_DECIMAL128 = (128, 14, 6176, 34)
+
+
+def _to_decimal(bits, width, exponent_bits, bias, precision):
+    # type: (int, int, int, int, int) -> decimal.Decimal
+    sign = '-' if bits >> (width - 1) else ''
+    combination = (bits >> (width - 6)) & 0x1f
+    if combination == 0x1e:
+        return decimal.Decimal(sign + 'Infinity')
+    if combination == 0x1f:
+        return decimal.Decimal(sign + ('sNaN' if (bits >> (width - 7)) & 1 else 'NaN'))
+    coefficient_bits = width - 1 - exponent_bits
+    if combination >> 3 == 0x3:
+        # The coefficient has the implicit prefix 100 and the exponent follows the combination bits.
+        exponent = (bits >> (coefficient_bits - 2)) & ((1 << exponent_bits) - 1)
+        coefficient = (0x4 << (coefficient_bits - 2)) | (bits & ((1 << (coefficient_bits - 2)) - 1))
+    else:
+        exponent = (bits >> coefficient_bits) & ((1 << exponent_bits) - 1)
+        coefficient = bits & ((1 << coefficient_bits) - 1)
+    if coefficient >= 10 ** precision:
+        # Non-canonical coefficients are decoded as zero.
+        coefficient = 0
+    # Constructed from a string, so the value is exact rather than rounded to the context.
+    return decimal.Decimal('{}{}E{}'.format(sign, coefficient, exponent - bias))
 
 
 def _decode_null(buffer):
@@ -146,6 +218,125 @@ def _decode_uuid(buffer):
     return buffer[16:], uuid.UUID(bytes=buffer[:16].tobytes())
 
 
+def _decode_char(buffer):
+    # type: (memoryview) -> Tuple[memoryview, str]
+    return buffer[4:], chr(c_unsigned_int.unpack(buffer[:4])[0])
+
+
+def _decode_decimal32(buffer):
+    # type: (memoryview) -> Tuple[memoryview, decimal.Decimal]
+    return buffer[4:], _to_decimal(c_unsigned_int.unpack(buffer[:4])[0], *_DECIMAL32)
+
+
+def _decode_decimal64(buffer):
+    # type: (memoryview) -> Tuple[memoryview, decimal.Decimal]
+    return buffer[8:], _to_decimal(c_unsigned_long_long.unpack(buffer[:8])[0], *_DECIMAL64)
+
+
+def _decode_decimal128(buffer):
+    # type: (memoryview) -> Tuple[memoryview, decimal.Decimal]
+    high, low = c_unsigned_long_long_pair.unpack(buffer[:16])
+    return buffer[16:], _to_decimal(high << 64 | low, *_DECIMAL128)
+
+
+def _invalid_constructor(constructor):
+    # type: (int) -> Callable[[memoryview], Tuple[memoryview, Any]]
+    def _decode_invalid(buffer):  # pylint: disable=unused-argument
+        # type: (memoryview) -> Tuple[memoryview, Any]
+        raise ValueError("Invalid constructor byte: {}".format(hex(constructor)))
+    return _decode_invalid
+
+
+class Timestamp(int):
+    """An AMQP timestamp, in milliseconds since the Unix epoch.
+
+    The `datetime` is only constructed when it is first read, and is cached.
+    """
+
+    @cached_property
+    def datetime(self):
+        # type: () -> datetime.datetime
+        return _EPOCH + datetime.timedelta(milliseconds=int(self))
+
+
+class LazyUUID(object):
+    """A decoded uuid holding its 16 bytes, with the `uuid.UUID` only constructed when it is used.
+
+    It compares equal to the equivalent `uuid.UUID`, and any other attribute (e.g. `hex` or
+    `int`) is read from the constructed `uuid.UUID`, which is available as `uuid`.
+    """
+
+    __slots__ = ('bytes', '_uuid')
+
+    def __init__(self, value):
+        # type: (bytes) -> None
+        self.bytes = value
+        self._uuid = None
+
+    @property
+    def uuid(self):
+        # type: () -> uuid.UUID
+        if self._uuid is None:
+            self._uuid = uuid.UUID(bytes=self.bytes)
+        return self._uuid
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            # Special and private names, e.g. as looked up by copy and pickle on an instance that
+            # has not been initialised, are not forwarded.
+            raise AttributeError(name)
+        return getattr(self.uuid, name)
+
+    def __reduce__(self):
+        return LazyUUID, (self.bytes,)
+
+    def __eq__(self, other):
+        if isinstance(other, (LazyUUID, uuid.UUID)):
+            return self.bytes == other.bytes
+        return NotImplemented
+
+    # As `uuid.UUID`, ordered by value, which is the order of the big-endian bytes.
+
+    def __lt__(self, other):
+        if isinstance(other, (LazyUUID, uuid.UUID)):
+            return self.bytes < other.bytes
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, (LazyUUID, uuid.UUID)):
+            return self.bytes <= other.bytes
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, (LazyUUID, uuid.UUID)):
+            return self.bytes > other.bytes
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, (LazyUUID, uuid.UUID)):
+            return self.bytes >= other.bytes
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+    def __str__(self):
+        return str(self.uuid)
+
+    def __repr__(self):
+        return "LazyUUID('{}')".format(self.uuid)
+
+
+def _decode_timestamp_lazy(buffer):
+    # type: (memoryview) -> Tuple[memoryview, Timestamp]
+    return buffer[8:], Timestamp(c_signed_long_long.unpack(buffer[:8])[0])
+
+
+def _decode_uuid_lazy(buffer):
+    # type: (memoryview) -> Tuple[memoryview, LazyUUID]
+    return buffer[16:], LazyUUID(buffer[:16].tobytes())
+
+
 def _decode_binary_small(buffer):
     # type: (memoryview) -> Tuple[memoryview, bytes]
     length_index = buffer[0] + 1
@@ -158,6 +349,41 @@ def _decode_binary_large(buffer):
     return buffer[length_index:], buffer[4:length_index].tobytes()
 
 
+def _intern_symbol(value):
+    # type: (bytes) -> str
+    try:
+        return _SYMBOL_CACHE[value]
+    except KeyError:
+        symbol = value.decode('utf-8')
+        if len(_SYMBOL_CACHE) < _SYMBOL_CACHE_SIZE:
+            _SYMBOL_CACHE[value] = symbol
+        return symbol
+
+
+def _decode_string_small(buffer):
+    # type: (memoryview) -> Tuple[memoryview, str]
+    length_index = buffer[0] + 1
+    return buffer[length_index:], str(buffer[1:length_index], 'utf-8')
+
+
+def _decode_string_large(buffer):
+    # type: (memoryview) -> Tuple[memoryview, str]
+    length_index = c_unsigned_long.unpack(buffer[:4])[0] + 4
+    return buffer[length_index:], str(buffer[4:length_index], 'utf-8')
+
+
+def _decode_symbol_small(buffer):
+    # type: (memoryview) -> Tuple[memoryview, str]
+    length_index = buffer[0] + 1
+    return buffer[length_index:], _intern_symbol(buffer[1:length_index].tobytes())
+
+
+def _decode_symbol_large(buffer):
+    # type: (memoryview) -> Tuple[memoryview, str]
+    length_index = c_unsigned_long.unpack(buffer[:4])[0] + 4
+    return buffer[length_index:], _intern_symbol(buffer[4:length_index].tobytes())
+
+
 def _decode_list_small(buffer):
     # type: (memoryview) -> Tuple[memoryview, List[Any]]
     count = buffer[1]
@@ -202,17 +428,49 @@ def _decode_map_large(buffer):
     return buffer, values
 
 
+def _unpack_array_list(data, typecode):
+    # type: (memoryview, str) -> List[Any]
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values.tolist()
+
+
+def _unpack_array_typed(data, typecode):
+    # type: (memoryview, str) -> array.array
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def _unpack_array_numpy(data, typecode):
+    # type: (memoryview, str) -> numpy.ndarray
+    dtype = numpy.dtype(typecode)
+    return numpy.frombuffer(data, dtype=dtype.newbyteorder('>')).astype(dtype)
+
+
+_unpack_array = _unpack_array_list
+
+
 def _decode_array_small(buffer):
     # type: (memoryview) -> Tuple[memoryview, List[Any]]
     count = buffer[1]  # Ignore first byte (size) and just rely on count
     if count:
         subconstructor = buffer[2]
+        fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+        if fixed:
+            end = 3 + count * fixed[1]
+            return buffer[end:], _unpack_array(buffer[3:end], fixed[0])
         buffer = buffer[3:]
         values = [None] * count
         for i in range(count):
             buffer, values[i] = _DECODE_BY_CONSTRUCTOR[subconstructor](buffer)
         return buffer, values
-    return buffer[2:], []
+    # Skip by size, so an empty array with or without an element constructor is consumed.
+    return buffer[1 + buffer[0]:], []
 
 
 def _decode_array_large(buffer):
@@ -220,63 +478,238 @@ def _decode_array_large(buffer):
     count = c_unsigned_long.unpack(buffer[4:8])[0]
     if count:
         subconstructor = buffer[8]
+        fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+        if fixed:
+            end = 9 + count * fixed[1]
+            return buffer[end:], _unpack_array(buffer[9:end], fixed[0])
         buffer = buffer[9:]
         values = [None] * count
         for i in range(count):
             buffer, values[i] = _DECODE_BY_CONSTRUCTOR[subconstructor](buffer)
         return buffer, values
-    return buffer[8:], []
+    return buffer[4 + c_unsigned_long.unpack(buffer[:4])[0]:], []
 
 
 def _decode_described(buffer):
     # type: (memoryview) -> Tuple[memoryview, Any]
-    # TODO: to move the cursor of the buffer to the described value based on size of the
-    #  descriptor without decoding descriptor value
-    composite_type = buffer[0]
-    buffer, descriptor = _DECODE_BY_CONSTRUCTOR[composite_type](buffer[1:])
+    # The common descriptor encodings (smallulong, ulong and sym8) are read inline
+    # rather than dispatched through the constructor table.
+    descriptor_type = buffer[0]
+    if descriptor_type == 0x53:
+        descriptor = buffer[1]
+        buffer = buffer[2:]
+    elif descriptor_type == 0x80:
+        descriptor = c_unsigned_long_long.unpack(buffer[1:9])[0]
+        buffer = buffer[9:]
+    elif descriptor_type == 0xa3:
+        length_index = buffer[1] + 2
+        descriptor = buffer[2:length_index].tobytes()
+        buffer = buffer[length_index:]
+    else:
+        buffer, descriptor = _DECODE_BY_CONSTRUCTOR[descriptor_type](buffer[1:])
     buffer, value = _DECODE_BY_CONSTRUCTOR[buffer[0]](buffer[1:])
     try:
         composite_type = _COMPOSITES[descriptor]
         return buffer, {composite_type: value}
-    except KeyError:
+    except (KeyError, TypeError):
         return buffer, value
 
 
-def decode_payload(buffer):
-    # type: (memoryview) -> Message
-    message = {}
+def _decode_binary_view(buffer):
+    # type: (memoryview) -> Tuple[memoryview, memoryview]
+    # Unlike the other decoders this starts at the constructor, as it is called directly for data sections.
+    if buffer[0] == 0xa0:
+        length_index = buffer[1] + 2
+        return buffer[length_index:], buffer[2:length_index]
+    length_index = c_unsigned_long.unpack(buffer[1:5])[0] + 5
+    return buffer[length_index:], buffer[5:length_index]
+
+
+Section = namedtuple('Section', ['field', 'index', 'repeated', 'body', 'transform'])
+Section.__doc__ = """How a message section is decoded, as registered with `register_section`.
+
+`field` is the `Message` field the section is decoded into and `index` its position. A `repeated`
+section is collected into a list. A message body is either repeated sections with the same
+descriptor or a single section, so a `body` section can't follow one with another descriptor.
+`transform`, if not None, is called with the decoded value of the section.
+"""
+
+
+def _make_header(value):
+    # type: (List[Any]) -> Header
+    return Header(*value)
+
+
+def _make_properties(value):
+    # type: (List[Any]) -> Properties
+    return Properties(*value)
+
+
+# As (repeated, body, default transform). The body is any number of data sections, any number
+# of sequence sections or a single value section. The order of the other sections isn't checked,
+# as our own encoder sends the delivery annotations last.
+_SECTION_KINDS = {
+    'header': (False, False, _make_header),
+    'delivery_annotations': (False, False, None),
+    'message_annotations': (False, False, None),
+    'properties': (False, False, _make_properties),
+    'application_properties': (False, False, None),
+    'data': (True, True, None),
+    'sequence': (True, True, None),
+    'value': (False, True, None),
+    'footer': (False, False, None),
+}
+
+# Message sections by descriptor code. Sections with any other descriptor are ignored.
+_SECTIONS = [None] * 256  # type: List[Optional[Section]]
+
+
+def register_section(descriptor, field, transform=None):
+    # type: (int, Optional[str], Optional[Callable[[Any], Any]]) -> None
+    """Select how the message section with the numeric `descriptor` is decoded, for every payload decoder.
+
+    The section is decoded into the `Message` field named `field`, and passed through
+    `transform` if it is given, e.g. to deserialize the body of a value section. Without a
+    transform, header and properties sections are decoded to `Header` and `Properties` and other
+    sections are left as decoded. If `field` is None, sections with `descriptor` are ignored.
+
+    Sections 0x70 to 0x78 are registered to their standard fields on import.
+    """
+    if not 0 <= descriptor < 256:
+        raise ValueError("Section descriptors must be between 0 and 255: {}".format(descriptor))
+    if field is None:
+        _SECTIONS[descriptor] = None
+        return
+    try:
+        repeated, body, default = _SECTION_KINDS[field]
+    except KeyError:
+        raise ValueError("Invalid message field: {}".format(field))
+    _SECTIONS[descriptor] = Section(
+        field, Message._fields.index(field), repeated, body, transform if transform is not None else default)
+
+
+for _descriptor, _field in enumerate(Message._fields, 112):
+    register_section(_descriptor, _field)
+
+
+def _check_body_order(section, descriptor, body, offset):
+    # type: (Optional[Section], int, int, int) -> int
+    # The body is any number of data sections, any number of sequence sections or a single value
+    # section. Takes the descriptor of the body sections seen so far, or -1, and returns it updated.
+    if section is None or not section.body:
+        return body
+    if body >= 0 and (descriptor != body or not section.repeated):
+        raise DecodeError("Unexpected {} section in the body".format(section.field), offset, 0x00)
+    return descriptor
+
+
+def decode_payload(buffer, zero_copy=False, sections=None):
+    # type: (memoryview, bool, Optional[AbstractSet[int]]) -> Message
+    """Decode the message sections of a transfer payload.
+
+    With `zero_copy`, each entry of `Message.data` is a read-only memoryview slice of `buffer`
+    rather than a bytes copy. The slices share the memory of the transfer buffer, so the buffer
+    must not be reused or modified while they are alive, and holding on to one keeps the whole
+    buffer allocated. Call `Message.detach()` to materialize the data as bytes and release it.
+
+    `sections` optionally restricts decoding to the sections with the given descriptor codes
+    (0x70 for the header through 0x78 for the footer). Other sections are skipped over by their
+    encoded size without being decoded, and are None in the returned message.
+
+    Sections are decoded as registered with `register_section`. A `DecodeError` is raised if the
+    body mixes data, sequence and value sections, or has more than one value section.
+    """
+    fields = [None] * len(Message._fields)
+    if zero_copy:
+        buffer = buffer.toreadonly()
+    size = len(buffer)
+    body = -1
     while buffer:
         # Ignore the first two bytes, they will always be the constructors for
         # described type then ulong.
         descriptor = buffer[2]
-        buffer, value = _DECODE_BY_CONSTRUCTOR[buffer[3]](buffer[4:])
-        if descriptor == 112:
-            message["header"] = Header(*value)
-        elif descriptor == 113:
-            message["delivery_annotations"] = value
-        elif descriptor == 114:
-            message["message_annotations"] = value
-        elif descriptor == 115:
-            message["properties"] = Properties(*value)
-        elif descriptor == 116:
-            message["application_properties"] = value
-        elif descriptor == 117:
-            try:
-                message["data"].append(value)
-            except KeyError:
-                message["data"] = [value]
-        elif descriptor == 118:
-            try:
-                message["sequence"].append(value)
-            except KeyError:
-                message["sequence"] = [value]
-        elif descriptor == 119:
-            message["value"] = value
-        elif descriptor == 120:
-            message["footer"] = value
+        section = _SECTIONS[descriptor]
+        body = _check_body_order(section, descriptor, body, size - len(buffer))
+        if section is None or sections is not None and descriptor not in sections:
+            buffer = buffer[_skip_at(buffer, 3):]
+            continue
+        if zero_copy and section.field == 'data':
+            buffer, value = _decode_binary_view(buffer[3:])
+        else:
+            buffer, value = _DECODE_BY_CONSTRUCTOR[buffer[3]](buffer[4:])
+        if section.transform is not None:
+            value = section.transform(value)
+        if not section.repeated:
+            fields[section.index] = value
+        elif fields[section.index] is None:
+            fields[section.index] = [value]
+        else:
+            fields[section.index].append(value)
     # TODO: we can possibly swap out the Message construct with a TypedDict
     #  for both input and output so we get the best of both.
-    return Message(**message)
+    return Message._make(fields)
+
+
+def _decode_flow_fields_at(buffer, offset, count):
+    # type: (memoryview, int, int) -> Tuple[int, List[Any]]
+    # All flow fields are uints and booleans, other than the trailing properties map,
+    # so the constructors they are encoded with are decoded inline.
+    fields = [None] * count
+    for i in range(count):
+        constructor = buffer[offset]
+        if constructor == 0x52:
+            fields[i] = buffer[offset + 1]
+            offset += 2
+        elif constructor == 0x70:
+            fields[i] = c_unsigned_int.unpack_from(buffer, offset + 1)[0]
+            offset += 5
+        elif constructor == 0x43:
+            fields[i] = 0
+            offset += 1
+        elif constructor == 0x40:
+            offset += 1
+        elif constructor == 0x42:
+            fields[i] = False
+            offset += 1
+        elif constructor == 0x41:
+            fields[i] = True
+            offset += 1
+        else:
+            offset, fields[i] = _DECODE_AT_CONSTRUCTOR[constructor](buffer, offset + 1)
+    return offset, fields
+
+
+def _decode_disposition_fields_at(buffer, offset, count):
+    # type: (memoryview, int, int) -> Tuple[int, List[Any]]
+    # Disposition fields are booleans and uints, other than the delivery state, which
+    # is usually an outcome without fields (e.g. accepted or released) that is also decoded inline.
+    fields = [None] * count
+    for i in range(count):
+        constructor = buffer[offset]
+        if constructor == 0x41:
+            fields[i] = True
+            offset += 1
+        elif constructor == 0x42:
+            fields[i] = False
+            offset += 1
+        elif constructor == 0x52:
+            fields[i] = buffer[offset + 1]
+            offset += 2
+        elif constructor == 0x43:
+            fields[i] = 0
+            offset += 1
+        elif constructor == 0x70:
+            fields[i] = c_unsigned_int.unpack_from(buffer, offset + 1)[0]
+            offset += 5
+        elif constructor == 0x40:
+            offset += 1
+        elif constructor == 0x00 and buffer[offset + 1] == 0x53 and buffer[offset + 3] == 0x45:
+            composite_type = _COMPOSITES.get(buffer[offset + 2])
+            fields[i] = [] if composite_type is None else {composite_type: []}
+            offset += 4
+        else:
+            offset, fields[i] = _DECODE_AT_CONSTRUCTOR[constructor](buffer, offset + 1)
+    return offset, fields
 
 
 def decode_frame(data):
@@ -289,10 +722,18 @@ def decode_frame(data):
         # list32 0xd0: data[4:8] is size, data[8:12] is count
         count = c_signed_int.unpack(data[8:12])[0]
         buffer = data[12:]
+    elif compound_list_type == 0x45:
+        # list0 0x45: a performative without any fields set, e.g. an end or close without an error
+        count = 0
+        buffer = data[4:]
     else:
         # list8 0xc0: data[4] is size, data[5] is count
         count = data[5]
         buffer = data[6:]
+    if frame_type == 0x13:
+        return frame_type, _decode_flow_fields_at(buffer, 0, count)[1]
+    if frame_type == 0x15:
+        return frame_type, _decode_disposition_fields_at(buffer, 0, count)[1]
     fields = [None] * count
     for i in range(count):
         buffer, fields[i] = _DECODE_BY_CONSTRUCTOR[buffer[0]](buffer[1:])
@@ -310,7 +751,10 @@ def decode_empty_frame(header):
     raise ValueError("Received unrecognized empty frame")
 
 
-_DECODE_BY_CONSTRUCTOR = [None] * 256  # type: List[Callable[memoryview]]
+# Constructors that are not defined by AMQP raise a ValueError naming the constructor.
+_DECODE_BY_CONSTRUCTOR = [
+    _invalid_constructor(constructor) for constructor in range(256)
+]  # type: List[Callable[memoryview]]
 _DECODE_BY_CONSTRUCTOR[0] = _decode_described
 _DECODE_BY_CONSTRUCTOR[64] = _decode_null
 _DECODE_BY_CONSTRUCTOR[65] = _decode_true
@@ -330,10 +774,14 @@ _DECODE_BY_CONSTRUCTOR[97] = _decode_short
 _DECODE_BY_CONSTRUCTOR[112] = _decode_uint_large
 _DECODE_BY_CONSTRUCTOR[113] = _decode_int_large
 _DECODE_BY_CONSTRUCTOR[114] = _decode_float
+_DECODE_BY_CONSTRUCTOR[115] = _decode_char
+_DECODE_BY_CONSTRUCTOR[116] = _decode_decimal32
 _DECODE_BY_CONSTRUCTOR[128] = _decode_ulong_large
 _DECODE_BY_CONSTRUCTOR[129] = _decode_long_large
 _DECODE_BY_CONSTRUCTOR[130] = _decode_double
 _DECODE_BY_CONSTRUCTOR[131] = _decode_timestamp
+_DECODE_BY_CONSTRUCTOR[132] = _decode_decimal64
+_DECODE_BY_CONSTRUCTOR[148] = _decode_decimal128
 _DECODE_BY_CONSTRUCTOR[152] = _decode_uuid
 _DECODE_BY_CONSTRUCTOR[160] = _decode_binary_small
 _DECODE_BY_CONSTRUCTOR[161] = _decode_binary_small
@@ -347,3 +795,1402 @@ _DECODE_BY_CONSTRUCTOR[208] = _decode_list_large
 _DECODE_BY_CONSTRUCTOR[209] = _decode_map_large
 _DECODE_BY_CONSTRUCTOR[224] = _decode_array_small
 _DECODE_BY_CONSTRUCTOR[240] = _decode_array_large
+
+
+# Offset-cursor engine.
+# Each decoder takes the full view and the offset of the encoded value (after its constructor)
+# and returns the offset following the value, so no intermediate memoryview is created
+# for anything other than binary/string content.
+
+
+def _decode_null_at(buffer, offset):  # pylint: disable=unused-argument
+    # type: (memoryview, int) -> Tuple[int, None]
+    return offset, None
+
+
+def _decode_true_at(buffer, offset):  # pylint: disable=unused-argument
+    # type: (memoryview, int) -> Tuple[int, bool]
+    return offset, True
+
+
+def _decode_false_at(buffer, offset):  # pylint: disable=unused-argument
+    # type: (memoryview, int) -> Tuple[int, bool]
+    return offset, False
+
+
+def _decode_zero_at(buffer, offset):  # pylint: disable=unused-argument
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset, 0
+
+
+def _decode_empty_at(buffer, offset):  # pylint: disable=unused-argument
+    # type: (memoryview, int) -> Tuple[int, List[None]]
+    return offset, []
+
+
+def _decode_boolean_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, bool]
+    return offset + 1, buffer[offset] == 1
+
+
+def _decode_ubyte_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 1, buffer[offset]
+
+
+def _decode_ushort_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 2, c_unsigned_short.unpack_from(buffer, offset)[0]
+
+
+def _decode_uint_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 4, c_unsigned_int.unpack_from(buffer, offset)[0]
+
+
+def _decode_ulong_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 8, c_unsigned_long_long.unpack_from(buffer, offset)[0]
+
+
+def _decode_byte_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 1, c_signed_char.unpack_from(buffer, offset)[0]
+
+
+def _decode_short_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 2, c_signed_short.unpack_from(buffer, offset)[0]
+
+
+def _decode_int_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 4, c_signed_int.unpack_from(buffer, offset)[0]
+
+
+def _decode_long_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    return offset + 8, c_signed_long_long.unpack_from(buffer, offset)[0]
+
+
+def _decode_float_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, float]
+    return offset + 4, c_float.unpack_from(buffer, offset)[0]
+
+
+def _decode_double_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, float]
+    return offset + 8, c_double.unpack_from(buffer, offset)[0]
+
+
+def _decode_uuid_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, uuid.UUID]
+    end = offset + 16
+    return end, uuid.UUID(bytes=buffer[offset:end].tobytes())
+
+
+def _decode_char_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    return offset + 4, chr(c_unsigned_int.unpack_from(buffer, offset)[0])
+
+
+def _decode_decimal32_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, decimal.Decimal]
+    return offset + 4, _to_decimal(c_unsigned_int.unpack_from(buffer, offset)[0], *_DECIMAL32)
+
+
+def _decode_decimal64_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, decimal.Decimal]
+    return offset + 8, _to_decimal(c_unsigned_long_long.unpack_from(buffer, offset)[0], *_DECIMAL64)
+
+
+def _decode_decimal128_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, decimal.Decimal]
+    high, low = c_unsigned_long_long_pair.unpack_from(buffer, offset)
+    return offset + 16, _to_decimal(high << 64 | low, *_DECIMAL128)
+
+
+def _decode_timestamp_lazy_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Timestamp]
+    return offset + 8, Timestamp(c_signed_long_long.unpack_from(buffer, offset)[0])
+
+
+def _decode_uuid_lazy_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, LazyUUID]
+    end = offset + 16
+    return end, LazyUUID(buffer[offset:end].tobytes())
+
+
+def _decode_binary_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, bytes]
+    start = offset + 1
+    end = start + buffer[offset]
+    return end, buffer[start:end].tobytes()
+
+
+def _decode_binary_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, bytes]
+    start = offset + 4
+    end = start + c_unsigned_long.unpack_from(buffer, offset)[0]
+    return end, buffer[start:end].tobytes()
+
+
+def _decode_string_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    start = offset + 1
+    end = start + buffer[offset]
+    return end, str(buffer[start:end], 'utf-8')
+
+
+def _decode_string_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    start = offset + 4
+    end = start + c_unsigned_long.unpack_from(buffer, offset)[0]
+    return end, str(buffer[start:end], 'utf-8')
+
+
+def _decode_symbol_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    start = offset + 1
+    end = start + buffer[offset]
+    return end, _intern_symbol(buffer[start:end].tobytes())
+
+
+def _decode_symbol_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    start = offset + 4
+    end = start + c_unsigned_long.unpack_from(buffer, offset)[0]
+    return end, _intern_symbol(buffer[start:end].tobytes())
+
+
+def _decode_list_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    count = buffer[offset + 1]
+    offset += 2
+    values = [None] * count
+    for i in range(count):
+        offset, values[i] = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+    return offset, values
+
+
+def _decode_list_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    count = c_unsigned_long.unpack_from(buffer, offset + 4)[0]
+    offset += 8
+    values = [None] * count
+    for i in range(count):
+        offset, values[i] = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+    return offset, values
+
+
+def _decode_map_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Dict[Any, Any]]
+    count = buffer[offset + 1] >> 1
+    offset += 2
+    values = {}
+    for _ in range(count):
+        offset, key = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        values[key] = value
+    return offset, values
+
+
+def _decode_map_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Dict[Any, Any]]
+    count = c_unsigned_long.unpack_from(buffer, offset + 4)[0] >> 1
+    offset += 8
+    values = {}
+    for _ in range(count):
+        offset, key = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        values[key] = value
+    return offset, values
+
+
+def _decode_array_small_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    count = buffer[offset + 1]
+    if count:
+        subconstructor = buffer[offset + 2]
+        fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+        offset += 3
+        if fixed:
+            end = offset + count * fixed[1]
+            return end, _unpack_array(buffer[offset:end], fixed[0])
+        decoder = _DECODE_AT_CONSTRUCTOR[subconstructor]
+        values = [None] * count
+        for i in range(count):
+            offset, values[i] = decoder(buffer, offset)
+        return offset, values
+    # Skip by size, so an empty array with or without an element constructor is consumed.
+    return offset + 1 + buffer[offset], []
+
+
+def _decode_array_large_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    count = c_unsigned_long.unpack_from(buffer, offset + 4)[0]
+    if count:
+        subconstructor = buffer[offset + 8]
+        fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+        offset += 9
+        if fixed:
+            end = offset + count * fixed[1]
+            return end, _unpack_array(buffer[offset:end], fixed[0])
+        decoder = _DECODE_AT_CONSTRUCTOR[subconstructor]
+        values = [None] * count
+        for i in range(count):
+            offset, values[i] = decoder(buffer, offset)
+        return offset, values
+    return offset + 4 + c_unsigned_long.unpack_from(buffer, offset)[0], []
+
+
+def _decode_described_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    descriptor_type = buffer[offset]
+    if descriptor_type == 0x53:
+        descriptor = buffer[offset + 1]
+        offset += 2
+    elif descriptor_type == 0x80:
+        descriptor = c_unsigned_long_long.unpack_from(buffer, offset + 1)[0]
+        offset += 9
+    elif descriptor_type == 0xa3:
+        start = offset + 2
+        offset = start + buffer[offset + 1]
+        descriptor = buffer[start:offset].tobytes()
+    else:
+        offset, descriptor = _DECODE_AT_CONSTRUCTOR[descriptor_type](buffer, offset + 1)
+    offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+    try:
+        composite_type = _COMPOSITES[descriptor]
+        return offset, {composite_type: value}
+    except (KeyError, TypeError):
+        return offset, value
+
+
+# Encoded width of each constructor subcategory (the high nibble of the constructor):
+# fixed widths are given in bytes, while -1 and -4 give the size of the length prefix
+# of variable width, compound and array encodings.
+_WIDTH_BY_SUBCATEGORY = (None, None, None, None, 0, 1, 2, 4, 8, 16, -1, -4, -1, -4, -1, -4)
+
+
+def _skip_at(buffer, offset):
+    # type: (memoryview, int) -> int
+    """Return the offset following the value whose constructor is at `offset`, without decoding it."""
+    constructor = buffer[offset]
+    if constructor == 0:
+        return _skip_at(buffer, _skip_at(buffer, offset + 1))
+    width = _WIDTH_BY_SUBCATEGORY[constructor >> 4]
+    if width is None:
+        raise ValueError("Invalid constructor byte: {}".format(constructor))
+    if width >= 0:
+        return offset + 1 + width
+    if width == -1:
+        return offset + 2 + buffer[offset + 1]
+    return offset + 5 + c_unsigned_long.unpack_from(buffer, offset + 1)[0]
+
+
+def _decode_binary_view_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, memoryview]
+    # Unlike the other decoders this starts at the constructor, as it is called directly for data sections.
+    if buffer[offset] == 0xa0:
+        start = offset + 2
+        end = start + buffer[offset + 1]
+    else:
+        start = offset + 5
+        end = start + c_unsigned_long.unpack_from(buffer, offset + 1)[0]
+    return end, buffer[start:end]
+
+
+# Number of fields of the list sections, for strict decoding.
+_SECTION_FIELDS = {112: len(Header._fields), 115: len(Properties._fields)}
+
+
+class DecodeError(ValueError):
+    """A malformed or truncated value was found by strict decoding.
+
+    :param str description: What is wrong with the value.
+    :param int offset: The offset of the constructor of the value within the buffer.
+    :param int constructor: The constructor byte of the value, or None if it is beyond the buffer.
+    """
+
+    def __init__(self, description, offset, constructor):
+        # type: (str, int, Optional[int]) -> None
+        super(DecodeError, self).__init__("{} at offset {} (constructor {})".format(
+            description, offset, constructor if constructor is None else hex(constructor)))
+        self.description = description
+        self.offset = offset
+        self.constructor = constructor
+
+
+def _decode_invalid_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    # The decoder of every constructor that is not defined by AMQP, for both offset-cursor tables.
+    raise DecodeError("Invalid constructor", offset - 1, buffer[offset - 1])
+
+
+# Strict decoders.
+# Sizes and counts are checked against the buffer once per binary, string, symbol or composite
+# value, and the contents of a composite must consume exactly its declared size. Fixed width
+# values are decoded unchecked: an overrun is caught by the check of the enclosing composite.
+
+
+# The checks take the constructor as an argument, as the elements of an array share the constructor
+# that precedes them rather than each having their own.
+
+
+def _decode_sized_strict(buffer, offset, constructor):
+    # type: (memoryview, int, int) -> Tuple[int, Any]
+    start = offset - 1
+    try:
+        if constructor & 0x10:
+            end = offset + 4 + c_unsigned_long.unpack_from(buffer, offset)[0]
+        else:
+            end = offset + 1 + buffer[offset]
+    except (IndexError, struct.error):
+        raise DecodeError("Truncated size", start, constructor)
+    if end > len(buffer):
+        raise DecodeError("Size exceeds the buffer", start, constructor)
+    # Decoded as configured by `set_string_decoding`.
+    return _DECODE_AT_CONSTRUCTOR[constructor](buffer, offset)
+
+
+def _decode_compound_strict(buffer, offset, constructor):
+    # type: (memoryview, int, int) -> Tuple[int, Any]
+    start = offset - 1
+    try:
+        if constructor & 0x10:
+            # list32, map32: size then count
+            end = offset + 4 + c_unsigned_long.unpack_from(buffer, offset)[0]
+            count = c_unsigned_long.unpack_from(buffer, offset + 4)[0]
+            offset += 8
+        else:
+            # list8, map8: size then count
+            end = offset + 1 + buffer[offset]
+            count = buffer[offset + 1]
+            offset += 2
+    except (IndexError, struct.error):
+        raise DecodeError("Truncated size or count", start, constructor)
+    if end > len(buffer):
+        raise DecodeError("Size exceeds the buffer", start, constructor)
+    if count > end - offset:
+        raise DecodeError("Count exceeds the size", start, constructor)
+    decoders = _DECODE_AT_CONSTRUCTOR_STRICT
+    try:
+        if constructor & 0x01:
+            values = {}
+            for _ in range(count >> 1):
+                offset, key = decoders[buffer[offset]](buffer, offset + 1)
+                offset, value = decoders[buffer[offset]](buffer, offset + 1)
+                values[key] = value
+        else:
+            values = [None] * count
+            for i in range(count):
+                offset, values[i] = decoders[buffer[offset]](buffer, offset + 1)
+    except DecodeError:
+        raise
+    except (IndexError, struct.error, ValueError):
+        raise DecodeError("Truncated contents", start, constructor)
+    except TypeError:
+        raise DecodeError("Unhashable map key", start, constructor)
+    if offset != end:
+        raise DecodeError("Contents do not match the size", start, constructor)
+    return offset, values
+
+
+def _decode_array_strict(buffer, offset, constructor):
+    # type: (memoryview, int, int) -> Tuple[int, List[Any]]
+    start = offset - 1
+    try:
+        if constructor & 0x10:
+            # array32: size then count
+            end = offset + 4 + c_unsigned_long.unpack_from(buffer, offset)[0]
+            count = c_unsigned_long.unpack_from(buffer, offset + 4)[0]
+            offset += 8
+        else:
+            # array8: size then count
+            end = offset + 1 + buffer[offset]
+            count = buffer[offset + 1]
+            offset += 2
+    except (IndexError, struct.error):
+        raise DecodeError("Truncated size or count", start, constructor)
+    if end > len(buffer):
+        raise DecodeError("Size exceeds the buffer", start, constructor)
+    if not count:
+        return end, []
+    if offset >= end:
+        raise DecodeError("Missing element constructor", start, constructor)
+    subconstructor = buffer[offset]
+    offset += 1
+    fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+    if fixed:
+        if offset + count * fixed[1] != end:
+            raise DecodeError("Contents do not match the size", start, constructor)
+        return end, _unpack_array(buffer[offset:end], fixed[0])
+    if _DECODE_AT_CONSTRUCTOR[subconstructor] is _decode_invalid_at:
+        raise DecodeError("Invalid element constructor", start, constructor)
+    if _WIDTH_BY_SUBCATEGORY[subconstructor >> 4] != 0 and count > end - offset:
+        raise DecodeError("Count exceeds the size", start, constructor)
+    values = [None] * count
+    try:
+        checked = _DECODE_ELEMENT_STRICT[subconstructor]
+        if checked:
+            for i in range(count):
+                offset, values[i] = checked(buffer, offset, subconstructor)
+        else:
+            decoder = _DECODE_AT_CONSTRUCTOR_STRICT[subconstructor]
+            for i in range(count):
+                offset, values[i] = decoder(buffer, offset)
+    except DecodeError:
+        raise
+    except (IndexError, struct.error, ValueError):
+        raise DecodeError("Truncated contents", start, constructor)
+    if offset != end:
+        raise DecodeError("Contents do not match the size", start, constructor)
+    return offset, values
+
+
+def _decode_char_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, str]
+    code_point = c_unsigned_int.unpack_from(buffer, offset)[0]
+    if code_point > 0x10ffff:
+        raise DecodeError("Invalid code point", offset - 1, 0x73)
+    return offset + 4, chr(code_point)
+
+
+def _decode_sized_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    return _decode_sized_strict(buffer, offset, buffer[offset - 1])
+
+
+def _decode_compound_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    return _decode_compound_strict(buffer, offset, buffer[offset - 1])
+
+
+def _decode_array_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, List[Any]]
+    return _decode_array_strict(buffer, offset, buffer[offset - 1])
+
+
+# The checked decoders of array elements, by element constructor.
+_DECODE_ELEMENT_STRICT = [None] * 256  # type: List[Optional[Callable[[memoryview, int, int], Tuple[int, Any]]]]
+for _constructor in (0xa0, 0xa1, 0xa3, 0xb0, 0xb1, 0xb3):
+    _DECODE_ELEMENT_STRICT[_constructor] = _decode_sized_strict
+for _constructor in (0xc0, 0xc1, 0xd0, 0xd1):
+    _DECODE_ELEMENT_STRICT[_constructor] = _decode_compound_strict
+for _constructor in (0xe0, 0xf0):
+    _DECODE_ELEMENT_STRICT[_constructor] = _decode_array_strict
+
+
+def _decode_described_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    offset, descriptor = _DECODE_AT_CONSTRUCTOR_STRICT[buffer[offset]](buffer, offset + 1)
+    offset, value = _DECODE_AT_CONSTRUCTOR_STRICT[buffer[offset]](buffer, offset + 1)
+    try:
+        composite_type = _COMPOSITES[descriptor]
+        return offset, {composite_type: value}
+    except (KeyError, TypeError):
+        return offset, value
+
+
+def _decode_descriptor_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, int]
+    # Starts at the described type constructor of a section or performative, and returns the
+    # offset of its value with the numeric descriptor, which may use either ulong encoding.
+    if buffer[offset] != 0x00:
+        raise DecodeError("Expected a described type", offset, buffer[offset])
+    start = offset + 1
+    if start < len(buffer) and buffer[start] in (0x53, 0x80):
+        offset, descriptor = _decode_strict_at(buffer, start)
+        if offset < len(buffer):
+            return offset, descriptor
+        raise DecodeError("Missing value", offset, None)
+    raise DecodeError("Invalid descriptor", start, buffer[start] if start < len(buffer) else None)
+
+
+def _decode_strict_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    # Starts at the constructor.
+    if offset >= len(buffer):
+        raise DecodeError("Missing value", offset, None)
+    constructor = buffer[offset]
+    try:
+        end, value = _DECODE_AT_CONSTRUCTOR_STRICT[constructor](buffer, offset + 1)
+    except DecodeError:
+        raise
+    except (IndexError, struct.error, ValueError):
+        raise DecodeError("Value exceeds the buffer", offset, constructor)
+    if end > len(buffer):
+        raise DecodeError("Value exceeds the buffer", offset, constructor)
+    return end, value
+
+
+# Constructors of values that contain other values.
+_NESTED = [False] * 256  # type: List[bool]
+for _constructor in (0x00, 0xc0, 0xc1, 0xd0, 0xd1, 0xe0, 0xf0):
+    _NESTED[_constructor] = True
+
+# Open composites on the stack of `decode_value_iterative`.
+_LIST = 0  # [_LIST, values, next index]
+_MAP = 1  # [_MAP, values, remaining keys and values, pending key]
+_ARRAY = 2  # [_ARRAY, values, next index, element constructor]
+_DESCRIBED = 3  # [_DESCRIBED, descriptor, descriptor decoded]
+
+
+def decode_value_iterative(buffer, offset=0, max_depth=DEFAULT_MAX_DEPTH, max_elements=DEFAULT_MAX_ELEMENTS):
+    # type: (memoryview, int, int, int) -> Tuple[int, Any]
+    """Decode the value whose constructor is at `offset`, returning `(offset, value)`.
+
+    Lists, maps, arrays and described values are decoded in a single loop over an explicit stack
+    of open composites rather than by recursion, with the same results as the offset-cursor
+    decoders. A ValueError is raised if composites are nested deeper than `max_depth`, or if
+    the value contains more than `max_elements` values in total. Element counts are checked
+    before anything is allocated for them.
+    """
+    decoders = _DECODE_AT_CONSTRUCTOR
+    stack = []  # type: List[List[Any]]
+    elements = 1
+    constructor = buffer[offset]
+    offset += 1
+    while True:
+        if _NESTED[constructor]:
+            if constructor == 0x00:
+                count = 2
+            elif constructor & 0x10:
+                # list32, map32, array32: size then count
+                size = offset + 4 + c_unsigned_long.unpack_from(buffer, offset)[0]
+                count = c_unsigned_long.unpack_from(buffer, offset + 4)[0]
+                offset += 8
+            else:
+                # list8, map8, array8: size then count
+                size = offset + 1 + buffer[offset]
+                count = buffer[offset + 1]
+                offset += 2
+            elements += count
+            if elements > max_elements:
+                raise ValueError("Value exceeds the maximum of {} elements".format(max_elements))
+            frame = None
+            if constructor == 0x00:
+                frame = [_DESCRIBED, None, False]
+            elif constructor >= 0xe0:
+                if not count:
+                    # Skip by size, so an empty array with or without an element constructor is consumed.
+                    offset, value = size, []
+                else:
+                    subconstructor = buffer[offset]
+                    offset += 1
+                    fixed = _FIXED_ARRAY_ELEMENTS[subconstructor]
+                    if fixed:
+                        end = offset + count * fixed[1]
+                        offset, value = end, _unpack_array(buffer[offset:end], fixed[0])
+                    elif _NESTED[subconstructor]:
+                        frame = [_ARRAY, [None] * count, 0, subconstructor]
+                    else:
+                        decoder = decoders[subconstructor]
+                        value = [None] * count
+                        for i in range(count):
+                            offset, value[i] = decoder(buffer, offset)
+            elif constructor & 0x01:
+                count &= ~1
+                if count:
+                    frame = [_MAP, {}, count, None]
+                else:
+                    value = {}
+            elif count:
+                frame = [_LIST, [None] * count, 0]
+            else:
+                value = []
+            if frame is not None:
+                if len(stack) >= max_depth:
+                    raise ValueError("Value exceeds the maximum nesting depth of {}".format(max_depth))
+                stack.append(frame)
+        else:
+            offset, value = decoders[constructor](buffer, offset)
+            frame = None
+        if frame is None:
+            # Hand the value to the innermost open composite, closing every composite it completes.
+            while stack:
+                frame = stack[-1]
+                kind = frame[0]
+                if kind == _MAP:
+                    if frame[2] & 1:
+                        frame[1][frame[3]] = value
+                    else:
+                        frame[3] = value
+                    frame[2] -= 1
+                    if frame[2]:
+                        break
+                    value = frame[1]
+                elif kind == _DESCRIBED:
+                    if not frame[2]:
+                        frame[1] = value
+                        frame[2] = True
+                        break
+                    try:
+                        value = {_COMPOSITES[frame[1]]: value}
+                    except (KeyError, TypeError):
+                        pass
+                else:
+                    values = frame[1]
+                    values[frame[2]] = value
+                    frame[2] += 1
+                    if frame[2] < len(values):
+                        break
+                    value = values
+                stack.pop()
+            else:
+                return offset, value
+        # Read the constructor of the next value in `frame`. Runs of values that are not composites
+        # are decoded directly here, up to the last value of the composite, which is left to the
+        # main loop so that it closes the composite.
+        kind = frame[0]
+        if kind == _ARRAY:
+            constructor = frame[3]
+            continue
+        constructor = buffer[offset]
+        offset += 1
+        if kind == _LIST:
+            values = frame[1]
+            index = frame[2]
+            last = len(values) - 1
+            while index < last and not _NESTED[constructor]:
+                offset, values[index] = decoders[constructor](buffer, offset)
+                index += 1
+                constructor = buffer[offset]
+                offset += 1
+            frame[2] = index
+        elif kind == _MAP:
+            values = frame[1]
+            remaining = frame[2]
+            key = frame[3]
+            while remaining > 1 and not _NESTED[constructor]:
+                offset, value = decoders[constructor](buffer, offset)
+                if remaining & 1:
+                    values[key] = value
+                else:
+                    key = value
+                remaining -= 1
+                constructor = buffer[offset]
+                offset += 1
+            frame[2] = remaining
+            frame[3] = key
+
+
+def _decode_iterative_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    return decode_value_iterative(buffer, offset - 1, _MAX_DEPTH, _MAX_ELEMENTS)
+
+
+def decode_payload_at(buffer, offset=0, zero_copy=False, sections=None, strict=False):
+    # type: (memoryview, int, bool, Optional[AbstractSet[int]], bool) -> Message
+    """Offset-cursor equivalent of `decode_payload`, decoding from `offset` to the end of `buffer`.
+
+    With `strict`, a malformed or truncated payload raises a `DecodeError` rather than an
+    arbitrary exception or a wrong result.
+    """
+    fields = [None] * len(Message._fields)
+    if zero_copy:
+        buffer = buffer.toreadonly()
+    end = len(buffer)
+    body = -1
+    while offset < end:
+        start = offset
+        if strict:
+            offset, descriptor = _decode_descriptor_strict_at(buffer, offset)
+            section = _SECTIONS[descriptor] if descriptor < 256 else None
+        else:
+            # Ignore the first two bytes, they will always be the constructors for
+            # described type then ulong.
+            descriptor = buffer[offset + 2]
+            offset += 3
+            section = _SECTIONS[descriptor]
+        body = _check_body_order(section, descriptor, body, start)
+        if section is None or sections is not None and descriptor not in sections:
+            start = offset
+            if not strict:
+                offset = _skip_at(buffer, offset)
+                continue
+            try:
+                offset = _skip_at(buffer, offset)
+            except (IndexError, struct.error, ValueError):
+                raise DecodeError("Invalid or truncated section", start, buffer[start])
+            if offset > end:
+                raise DecodeError("Section exceeds the buffer", start, buffer[start])
+            continue
+        if zero_copy and section.field == 'data':
+            start = offset
+            if strict and (buffer[start] not in (0xa0, 0xb0) or end - start < (2 if buffer[start] == 0xa0 else 5)):
+                raise DecodeError("Invalid data section", start, buffer[start])
+            offset, value = _decode_binary_view_at(buffer, start)
+            if strict and offset > end:
+                raise DecodeError("Size exceeds the buffer", start, buffer[start])
+        elif strict:
+            start = offset
+            offset, value = _decode_strict_at(buffer, offset)
+            if descriptor in (112, 115) and not (isinstance(value, list) and len(value) <= _SECTION_FIELDS[descriptor]):
+                raise DecodeError("Invalid {} section".format("header" if descriptor == 112 else "properties"),
+                                  start, buffer[start])
+        else:
+            offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        if section.transform is not None:
+            value = section.transform(value)
+        if not section.repeated:
+            fields[section.index] = value
+        elif fields[section.index] is None:
+            fields[section.index] = [value]
+        else:
+            fields[section.index].append(value)
+    return Message._make(fields)
+
+
+def decode_payloads(buffers, zero_copy=False, sections=None):
+    # type: (Iterable[memoryview], bool, Optional[AbstractSet[int]]) -> List[Message]
+    """Decode a batch of transfer payloads, as with `decode_payload_at`.
+
+    The lookups are hoisted out of the per-message loop, and each message is built positionally
+    from a list of sections indexed by field rather than through keyword arguments.
+    """
+    decoders = _DECODE_AT_CONSTRUCTOR
+    registered = _SECTIONS
+    make_message = Message._make
+    size = len(Message._fields)
+    messages = []
+    for buffer in buffers:
+        if zero_copy:
+            buffer = buffer.toreadonly()
+        fields = [None] * size
+        offset = 0
+        end = len(buffer)
+        body = -1
+        while offset < end:
+            # Ignore the first two bytes, they will always be the constructors for
+            # described type then ulong.
+            descriptor = buffer[offset + 2]
+            section = registered[descriptor]
+            body = _check_body_order(section, descriptor, body, offset)
+            if section is None or sections is not None and descriptor not in sections:
+                offset = _skip_at(buffer, offset + 3)
+                continue
+            if zero_copy and section.field == 'data':
+                offset, value = _decode_binary_view_at(buffer, offset + 3)
+            else:
+                offset, value = decoders[buffer[offset + 3]](buffer, offset + 4)
+            if section.transform is not None:
+                value = section.transform(value)
+            index = section.index
+            if not section.repeated:
+                fields[index] = value
+            elif fields[index] is None:
+                fields[index] = [value]
+            else:
+                fields[index].append(value)
+        messages.append(make_message(fields))
+    return messages
+
+
+PropertyPredicate = namedtuple('PropertyPredicate', ['key', 'test'])
+PropertyPredicate.__doc__ = """A test of one application property, for `match_payload`.
+
+`key` is the raw bytes of the property name and `test` is called with the property value. Binary,
+string and symbol values are passed as a memoryview of their encoded content, other values as
+decoded by the offset-cursor engine.
+"""
+
+
+def _as_bytes(value):
+    # type: (Any) -> Any
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def property_equals(key, value):
+    # type: (Union[str, bytes], Any) -> PropertyPredicate
+    """Match messages where application property `key` equals `value`."""
+    value = _as_bytes(value)
+
+    def test(actual):
+        return actual == value
+    return PropertyPredicate(_as_bytes(key), test)
+
+
+def property_startswith(key, prefix):
+    # type: (Union[str, bytes], Union[str, bytes]) -> PropertyPredicate
+    """Match messages where application property `key` is a string, symbol or binary starting with `prefix`."""
+    prefix = _as_bytes(prefix)
+    size = len(prefix)
+
+    def test(actual):
+        return isinstance(actual, memoryview) and actual[:size] == prefix
+    return PropertyPredicate(_as_bytes(key), test)
+
+
+def property_in(key, values):
+    # type: (Union[str, bytes], Iterable[Any]) -> PropertyPredicate
+    """Match messages where application property `key` is one of `values`."""
+    values = frozenset(_as_bytes(value) for value in values)
+
+    def test(actual):
+        if isinstance(actual, memoryview):
+            actual = actual.tobytes()
+        return actual in values
+    return PropertyPredicate(_as_bytes(key), test)
+
+
+def _decode_content_at(buffer, offset):
+    # type: (memoryview, int) -> Tuple[int, Any]
+    # Starts at the constructor. Binary, string and symbol content is returned undecoded.
+    constructor = buffer[offset]
+    if constructor in (0xa0, 0xa1, 0xa3):
+        start = offset + 2
+        end = start + buffer[offset + 1]
+        return end, buffer[start:end]
+    if constructor in (0xb0, 0xb1, 0xb3):
+        start = offset + 5
+        end = start + c_unsigned_long.unpack_from(buffer, offset + 1)[0]
+        return end, buffer[start:end]
+    return _DECODE_AT_CONSTRUCTOR[constructor](buffer, offset + 1)
+
+
+def _match_properties(buffer, offset, predicates):
+    # type: (memoryview, int, Sequence[PropertyPredicate]) -> bool
+    constructor = buffer[offset]
+    if constructor == 0xc1:
+        # map8: size then count
+        count = buffer[offset + 2] >> 1
+        offset += 3
+    elif constructor == 0xd1:
+        # map32: size then count
+        count = c_unsigned_long.unpack_from(buffer, offset + 5)[0] >> 1
+        offset += 9
+    else:
+        return False
+    matched = 0
+    for _ in range(count):
+        offset, key = _decode_content_at(buffer, offset)
+        tests = [predicate.test for predicate in predicates if key == predicate.key]
+        if not tests:
+            offset = _skip_at(buffer, offset)
+            continue
+        offset, value = _decode_content_at(buffer, offset)
+        for test in tests:
+            if not test(value):
+                return False
+        matched += len(tests)
+        if matched == len(predicates):
+            return True
+    return False
+
+
+def match_payload(buffer, predicates, offset=0):
+    # type: (memoryview, Sequence[PropertyPredicate], int) -> bool
+    """Return whether the application properties of a transfer payload satisfy all of `predicates`.
+
+    The predicates are evaluated against the encoded payload: the sections ahead of the
+    application properties are skipped by size, and the map is walked key by key, decoding only
+    the values of the properties being tested. A message without the section or without one
+    of the properties does not match. Only matching payloads need to be passed on to
+    `decode_payload`, e.g. `decode_payloads(b for b in buffers if match_payload(b, predicates))`.
+    """
+    end = len(buffer)
+    while offset < end:
+        # Ignore the first two bytes, they will always be the constructors for
+        # described type then ulong.
+        descriptor = buffer[offset + 2]
+        if descriptor == 116:
+            return _match_properties(buffer, offset + 3, predicates)
+        if descriptor > 116:
+            # Application properties always precede the body and footer.
+            break
+        offset = _skip_at(buffer, offset + 3)
+    return False
+
+
+Column = namedtuple('Column', ['section', 'key', 'typecode', 'default'])
+Column.__new__.__defaults__ = (None, None, None)
+Column.__doc__ = """A column of `decode_columns`.
+
+`section` is the descriptor code of the message section holding the value. For annotations,
+application properties and the footer, `key` is the map key; for the header and properties,
+it is the field name. For the data section (0x75) the value is the total size of the data, and
+for the other body sections `key` is ignored and the value is the whole section.
+
+Values are collected into an `array.array` of `typecode`, or a list if `typecode` is None.
+Messages without the value get `default`, which is 0 if not given for a typed column.
+"""
+
+
+def _decode_map_columns(buffer, offset, keys, row):
+    # type: (memoryview, int, Dict[Any, List[int]], List[Any]) -> int
+    end = _skip_at(buffer, offset)
+    constructor = buffer[offset]
+    if constructor == 0xc1:
+        # map8: size then count
+        count = buffer[offset + 2] >> 1
+        offset += 3
+    elif constructor == 0xd1:
+        # map32: size then count
+        count = c_unsigned_long.unpack_from(buffer, offset + 5)[0] >> 1
+        offset += 9
+    else:
+        return end
+    remaining = len(keys)
+    for _ in range(count):
+        offset, key = _decode_content_at(buffer, offset)
+        if isinstance(key, memoryview):
+            key = key.tobytes()
+        positions = keys.get(key)
+        if positions is None:
+            offset = _skip_at(buffer, offset)
+            continue
+        offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        if value is not None:
+            for position in positions:
+                row[position] = value
+        remaining -= 1
+        if not remaining:
+            break
+    return end
+
+
+def _decode_list_columns(buffer, offset, keys, row):
+    # type: (memoryview, int, Dict[int, List[int]], List[Any]) -> int
+    end = _skip_at(buffer, offset)
+    constructor = buffer[offset]
+    if constructor == 0xc0:
+        # list8: size then count
+        count = buffer[offset + 2]
+        offset += 3
+    elif constructor == 0xd0:
+        # list32: size then count
+        count = c_unsigned_long.unpack_from(buffer, offset + 5)[0]
+        offset += 9
+    else:
+        return end
+    count = min(count, max(keys) + 1)
+    for index in range(count):
+        positions = keys.get(index)
+        if positions is None:
+            offset = _skip_at(buffer, offset)
+            continue
+        offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)
+        if value is not None:
+            for position in positions:
+                row[position] = value
+    return end
+
+
+def decode_columns(buffers, columns, result_type='array'):
+    # type: (Iterable[memoryview], Dict[str, Column], str) -> Dict[str, Any]
+    """Decode selected message fields from a batch of transfer payloads into columns.
+
+    `columns` maps each column name to a `Column`, and the result maps the same names to one
+    value per payload. No Message is built: sections without any column are skipped by size, and
+    within the others only the selected fields are decoded. `result_type` selects the type of the
+    typed columns as with `set_array_decoding`: 'list', 'array' (the default) or 'numpy'.
+    """
+    if result_type == 'numpy':
+        if numpy is None:
+            raise ImportError("NumPy is required to decode columns to 'numpy'.")
+    elif result_type not in ('list', 'array'):
+        raise ValueError("Invalid column result type: {}".format(result_type))
+    names = list(columns)
+    wanted = {}  # type: Dict[int, Dict[Any, List[int]]]
+    defaults = []
+    outputs = []
+    for position, name in enumerate(names):
+        column = columns[name]
+        if column.section == 112:
+            key = Header._fields.index(column.key)
+        elif column.section == 115:
+            key = Properties._fields.index(column.key)
+        elif column.section in (113, 114, 116, 120):
+            key = _as_bytes(column.key)
+        else:
+            key = None
+        wanted.setdefault(column.section, {}).setdefault(key, []).append(position)
+        default = column.default
+        if default is None and (column.typecode or column.section == 117):
+            default = 0
+        defaults.append(default)
+        outputs.append(array.array(column.typecode) if column.typecode and result_type != 'list' else [])
+    for buffer in buffers:
+        row = list(defaults)
+        offset = 0
+        end = len(buffer)
+        while offset < end:
+            # Ignore the first two bytes, they will always be the constructors for
+            # described type then ulong.
+            descriptor = buffer[offset + 2]
+            keys = wanted.get(descriptor)
+            if keys is None:
+                offset = _skip_at(buffer, offset + 3)
+            elif descriptor in (113, 114, 116, 120):
+                offset = _decode_map_columns(buffer, offset + 3, keys, row)
+            elif descriptor in (112, 115):
+                offset = _decode_list_columns(buffer, offset + 3, keys, row)
+            elif descriptor == 117:
+                offset, value = _decode_binary_view_at(buffer, offset + 3)
+                for position in keys[None]:
+                    row[position] += len(value)
+            else:
+                offset, value = _DECODE_AT_CONSTRUCTOR[buffer[offset + 3]](buffer, offset + 4)
+                for position in keys[None]:
+                    row[position] = value
+        for output, value in zip(outputs, row):
+            output.append(value)
+    if result_type == 'numpy':
+        outputs = [numpy.frombuffer(output, dtype=output.typecode) if isinstance(output, array.array) else output
+                   for output in outputs]
+    return dict(zip(names, outputs))
+
+
+def decode_frame_at(data, offset=0, strict=False):
+    # type: (memoryview, int, bool) -> Tuple[int, List[Any]]
+    """Offset-cursor equivalent of `decode_frame`, decoding the performative that starts at `offset`.
+
+    For transfer frames the trailing payload is appended as a single slice of `data`. With
+    `strict`, a malformed or truncated performative raises a `DecodeError`.
+    """
+    if strict:
+        offset, frame_type = _decode_descriptor_strict_at(data, offset)
+        if data[offset] not in (0x45, 0xc0, 0xd0):
+            raise DecodeError("Performative is not a list", offset, data[offset])
+        offset, fields = _decode_strict_at(data, offset)
+        if frame_type == 20:
+            fields.append(data[offset:])
+        return frame_type, fields
+    # Ignore the first two bytes, they will always be the constructors for
+    # described type then ulong.
+    frame_type = data[offset + 2]
+    if data[offset + 3] == 0xd0:
+        # list32 0xd0: size then count
+        count = c_signed_int.unpack_from(data, offset + 8)[0]
+        offset += 12
+    elif data[offset + 3] == 0x45:
+        # list0 0x45: no fields
+        count = 0
+        offset += 4
+    else:
+        # list8 0xc0: size then count
+        count = data[offset + 5]
+        offset += 6
+    if frame_type == 0x13:
+        return frame_type, _decode_flow_fields_at(data, offset, count)[1]
+    if frame_type == 0x15:
+        return frame_type, _decode_disposition_fields_at(data, offset, count)[1]
+    fields = [None] * count
+    for i in range(count):
+        offset, fields[i] = _DECODE_AT_CONSTRUCTOR[data[offset]](data, offset + 1)
+    if frame_type == 20:
+        fields.append(data[offset:])
+    return frame_type, fields
+
+
+class LazyMessage(object):
+    """A received message whose sections are decoded on first access.
+
+    Only the offset of each section is recorded when the payload is received. Each of the `Message`
+    attributes is decoded the first time it is read and the result is cached on the object.
+    The message keeps a reference to the receive buffer, which must not be modified while the
+    message is in use.
+    """
+
+    def __init__(self, buffer, sections):
+        # type: (memoryview, Dict[str, Tuple[Section, Any]]) -> None
+        self._buffer = buffer
+        self._sections = sections
+
+    def _decode_section(self, field):
+        # type: (str) -> Any
+        try:
+            section, offset = self._sections[field]
+        except KeyError:
+            return None
+        value = _DECODE_AT_CONSTRUCTOR[self._buffer[offset]](self._buffer, offset + 1)[1]
+        return value if section.transform is None else section.transform(value)
+
+    def _decode_sections(self, field):
+        # type: (str) -> Optional[List[Any]]
+        try:
+            section, offsets = self._sections[field]
+        except KeyError:
+            return None
+        buffer = self._buffer
+        values = [_DECODE_AT_CONSTRUCTOR[buffer[offset]](buffer, offset + 1)[1] for offset in offsets]
+        return values if section.transform is None else [section.transform(value) for value in values]
+
+    @cached_property
+    def header(self):
+        # type: () -> Optional[Header]
+        return self._decode_section('header')
+
+    @cached_property
+    def delivery_annotations(self):
+        # type: () -> Optional[Dict[Any, Any]]
+        return self._decode_section('delivery_annotations')
+
+    @cached_property
+    def message_annotations(self):
+        # type: () -> Optional[Dict[Any, Any]]
+        return self._decode_section('message_annotations')
+
+    @cached_property
+    def properties(self):
+        # type: () -> Optional[Properties]
+        return self._decode_section('properties')
+
+    @cached_property
+    def application_properties(self):
+        # type: () -> Optional[Dict[Any, Any]]
+        return self._decode_section('application_properties')
+
+    @cached_property
+    def data(self):
+        # type: () -> Optional[List[bytes]]
+        return self._decode_sections('data')
+
+    @cached_property
+    def sequence(self):
+        # type: () -> Optional[List[Any]]
+        return self._decode_sections('sequence')
+
+    @cached_property
+    def value(self):
+        # type: () -> Any
+        return self._decode_section('value')
+
+    @cached_property
+    def footer(self):
+        # type: () -> Optional[Dict[Any, Any]]
+        return self._decode_section('footer')
+
+    def to_message(self):
+        # type: () -> Message
+        """Decode any remaining sections and return the equivalent `Message`."""
+        return Message(*(getattr(self, field) for field in Message._fields))
+
+
+def decode_payload_lazy(buffer, offset=0):
+    # type: (memoryview, int) -> LazyMessage
+    """Record the section offsets of the payload in `buffer`, deferring all decoding to `LazyMessage`."""
+    sections = {}
+    end = len(buffer)
+    body = -1
+    while offset < end:
+        # Ignore the first two bytes, they will always be the constructors for
+        # described type then ulong.
+        descriptor = buffer[offset + 2]
+        section = _SECTIONS[descriptor]
+        body = _check_body_order(section, descriptor, body, offset)
+        if section is not None:
+            if not section.repeated:
+                sections[section.field] = (section, offset + 3)
+            elif section.field in sections:
+                sections[section.field][1].append(offset + 3)
+            else:
+                sections[section.field] = (section, [offset + 3])
+        offset = _skip_at(buffer, offset + 3)
+    return LazyMessage(buffer, sections)
+
+
+_DECODE_AT_CONSTRUCTOR = [_decode_invalid_at] * 256  # type: List[Callable[memoryview, int]]
+_DECODE_AT_CONSTRUCTOR[0] = _decode_described_at
+_DECODE_AT_CONSTRUCTOR[64] = _decode_null_at
+_DECODE_AT_CONSTRUCTOR[65] = _decode_true_at
+_DECODE_AT_CONSTRUCTOR[66] = _decode_false_at
+_DECODE_AT_CONSTRUCTOR[67] = _decode_zero_at
+_DECODE_AT_CONSTRUCTOR[68] = _decode_zero_at
+_DECODE_AT_CONSTRUCTOR[69] = _decode_empty_at
+_DECODE_AT_CONSTRUCTOR[80] = _decode_ubyte_at
+_DECODE_AT_CONSTRUCTOR[81] = _decode_byte_at
+_DECODE_AT_CONSTRUCTOR[82] = _decode_ubyte_at
+_DECODE_AT_CONSTRUCTOR[83] = _decode_ubyte_at
+_DECODE_AT_CONSTRUCTOR[84] = _decode_byte_at
+_DECODE_AT_CONSTRUCTOR[85] = _decode_byte_at
+_DECODE_AT_CONSTRUCTOR[86] = _decode_boolean_at
+_DECODE_AT_CONSTRUCTOR[96] = _decode_ushort_at
+_DECODE_AT_CONSTRUCTOR[97] = _decode_short_at
+_DECODE_AT_CONSTRUCTOR[112] = _decode_uint_large_at
+_DECODE_AT_CONSTRUCTOR[113] = _decode_int_large_at
+_DECODE_AT_CONSTRUCTOR[114] = _decode_float_at
+_DECODE_AT_CONSTRUCTOR[115] = _decode_char_at
+_DECODE_AT_CONSTRUCTOR[116] = _decode_decimal32_at
+_DECODE_AT_CONSTRUCTOR[128] = _decode_ulong_large_at
+_DECODE_AT_CONSTRUCTOR[129] = _decode_long_large_at
+_DECODE_AT_CONSTRUCTOR[130] = _decode_double_at
+_DECODE_AT_CONSTRUCTOR[131] = _decode_long_large_at
+_DECODE_AT_CONSTRUCTOR[132] = _decode_decimal64_at
+_DECODE_AT_CONSTRUCTOR[148] = _decode_decimal128_at
+_DECODE_AT_CONSTRUCTOR[152] = _decode_uuid_at
+_DECODE_AT_CONSTRUCTOR[160] = _decode_binary_small_at
+_DECODE_AT_CONSTRUCTOR[161] = _decode_binary_small_at
+_DECODE_AT_CONSTRUCTOR[163] = _decode_binary_small_at
+_DECODE_AT_CONSTRUCTOR[176] = _decode_binary_large_at
+_DECODE_AT_CONSTRUCTOR[177] = _decode_binary_large_at
+_DECODE_AT_CONSTRUCTOR[179] = _decode_binary_large_at
+_DECODE_AT_CONSTRUCTOR[192] = _decode_list_small_at
+_DECODE_AT_CONSTRUCTOR[193] = _decode_map_small_at
+_DECODE_AT_CONSTRUCTOR[208] = _decode_list_large_at
+_DECODE_AT_CONSTRUCTOR[209] = _decode_map_large_at
+_DECODE_AT_CONSTRUCTOR[224] = _decode_array_small_at
+_DECODE_AT_CONSTRUCTOR[240] = _decode_array_large_at
+
+_DECODE_AT_CONSTRUCTOR_STRICT = list(_DECODE_AT_CONSTRUCTOR)  # type: List[Callable[memoryview, int]]
+_DECODE_AT_CONSTRUCTOR_STRICT[0] = _decode_described_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[115] = _decode_char_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[160] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[161] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[163] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[176] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[177] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[179] = _decode_sized_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[192] = _decode_compound_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[193] = _decode_compound_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[208] = _decode_compound_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[209] = _decode_compound_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[224] = _decode_array_strict_at
+_DECODE_AT_CONSTRUCTOR_STRICT[240] = _decode_array_strict_at
+
+# Native equivalents of the default decoders, from the optional `_decode_accel` extension.
+_PYTHON_BY_CONSTRUCTOR = list(_DECODE_BY_CONSTRUCTOR)
+_PYTHON_AT_CONSTRUCTOR = list(_DECODE_AT_CONSTRUCTOR)
+if _decode_accel is not None:
+    _NATIVE_BY_CONSTRUCTOR = _decode_accel.decoders(_DECODE_BY_CONSTRUCTOR, _COMPOSITES, uuid.UUID, True)
+    _NATIVE_AT_CONSTRUCTOR = _decode_accel.decoders(_DECODE_AT_CONSTRUCTOR, _COMPOSITES, uuid.UUID, False)
+else:
+    _NATIVE_BY_CONSTRUCTOR = _NATIVE_AT_CONSTRUCTOR = [None] * 256
+_NATIVE_DECODING = _decode_accel is not None
+
+
+def _install_native_decoders():
+    # type: () -> None
+    # Swap the default Python decoders still in the tables for their native equivalents, or back.
+    for table, python, native in (
+            (_DECODE_BY_CONSTRUCTOR, _PYTHON_BY_CONSTRUCTOR, _NATIVE_BY_CONSTRUCTOR),
+            (_DECODE_AT_CONSTRUCTOR, _PYTHON_AT_CONSTRUCTOR, _NATIVE_AT_CONSTRUCTOR),
+            (_DECODE_AT_CONSTRUCTOR_STRICT, _PYTHON_AT_CONSTRUCTOR, _NATIVE_AT_CONSTRUCTOR)):
+        for constructor in range(256):
+            if native[constructor] is None:
+                continue
+            if _NATIVE_DECODING and table[constructor] is python[constructor]:
+                table[constructor] = native[constructor]
+            elif not _NATIVE_DECODING and table[constructor] is native[constructor]:
+                table[constructor] = python[constructor]
+
+
+_install_native_decoders()
+
+
+def set_string_decoding(enabled, symbol_cache_size=1024):
+    # type: (bool, int) -> None
+    """Select how strings and symbols are decoded, for both decoder engines.
+
+    By default they are returned as raw bytes and left to the caller to decode. When enabled,
+    strings are decoded to `str`, and symbols are decoded to `str` through a process-wide cache
+    keyed by their raw bytes, so that recurring symbols such as annotation keys are only decoded
+    once. The cache stops admitting new symbols once it holds `symbol_cache_size` entries.
+    """
+    global _SYMBOL_CACHE_SIZE  # pylint: disable=global-statement
+    _SYMBOL_CACHE.clear()
+    _SYMBOL_CACHE_SIZE = symbol_cache_size
+    if enabled:
+        _DECODE_BY_CONSTRUCTOR[161] = _decode_string_small
+        _DECODE_BY_CONSTRUCTOR[163] = _decode_symbol_small
+        _DECODE_BY_CONSTRUCTOR[177] = _decode_string_large
+        _DECODE_BY_CONSTRUCTOR[179] = _decode_symbol_large
+        _DECODE_AT_CONSTRUCTOR[161] = _decode_string_small_at
+        _DECODE_AT_CONSTRUCTOR[163] = _decode_symbol_small_at
+        _DECODE_AT_CONSTRUCTOR[177] = _decode_string_large_at
+        _DECODE_AT_CONSTRUCTOR[179] = _decode_symbol_large_at
+    else:
+        _DECODE_BY_CONSTRUCTOR[161] = _decode_binary_small
+        _DECODE_BY_CONSTRUCTOR[163] = _decode_binary_small
+        _DECODE_BY_CONSTRUCTOR[177] = _decode_binary_large
+        _DECODE_BY_CONSTRUCTOR[179] = _decode_binary_large
+        _DECODE_AT_CONSTRUCTOR[161] = _decode_binary_small_at
+        _DECODE_AT_CONSTRUCTOR[163] = _decode_binary_small_at
+        _DECODE_AT_CONSTRUCTOR[177] = _decode_binary_large_at
+        _DECODE_AT_CONSTRUCTOR[179] = _decode_binary_large_at
+    _install_native_decoders()
+
+
+def set_array_decoding(result_type):
+    # type: (str) -> None
+    """Select the result type of arrays with fixed width numeric elements, for both decoder engines.
+
+    Arrays of int, long, uint, ulong, float, double and timestamp are unpacked in a single
+    operation rather than element by element. `result_type` is one of 'list' (the default),
+    'array' for a native byte order `array.array`, or 'numpy' for a native byte order
+    `numpy.ndarray`, which requires NumPy to be installed. Arrays of other element types
+    are always decoded to lists.
+    """
+    global _unpack_array  # pylint: disable=global-statement
+    if result_type == 'list':
+        _unpack_array = _unpack_array_list
+    elif result_type == 'array':
+        _unpack_array = _unpack_array_typed
+    elif result_type == 'numpy':
+        if numpy is None:
+            raise ImportError("NumPy is required to decode arrays to 'numpy'.")
+        _unpack_array = _unpack_array_numpy
+    else:
+        raise ValueError("Invalid array result type: {}".format(result_type))
+
+
+def set_iterative_decoding(enabled, max_depth=DEFAULT_MAX_DEPTH, max_elements=DEFAULT_MAX_ELEMENTS):
+    # type: (bool, int, int) -> None
+    """Select whether composite values are decoded iteratively by the offset-cursor engine.
+
+    When enabled, lists, maps, arrays and described values (including message sections and
+    performative fields) are decoded by `decode_value_iterative` with the given limits, so
+    deeply nested or oversized values raise a ValueError instead of a RecursionError or an
+    unbounded allocation.
+    """
+    global _MAX_DEPTH, _MAX_ELEMENTS  # pylint: disable=global-statement
+    _MAX_DEPTH = max_depth
+    _MAX_ELEMENTS = max_elements
+    for constructor, decoder in (
+            (0, _decode_described_at),
+            (192, _decode_list_small_at),
+            (193, _decode_map_small_at),
+            (208, _decode_list_large_at),
+            (209, _decode_map_large_at),
+            (224, _decode_array_small_at),
+            (240, _decode_array_large_at)):
+        _DECODE_AT_CONSTRUCTOR[constructor] = _decode_iterative_at if enabled else decoder
+    _install_native_decoders()
+
+
+def set_lazy_types(enabled):
+    # type: (bool) -> None
+    """Select whether timestamps and uuids are decoded to lazy wrapper types, for both decoder engines.
+
+    By default timestamps are decoded to ints of milliseconds and uuids to `uuid.UUID`. When
+    enabled, timestamps are decoded to `Timestamp`, an int with a cached `datetime`, and uuids
+    to `LazyUUID`, which only constructs the `uuid.UUID` when it is used. Arrays of timestamps
+    are not affected.
+    """
+    tables = (
+        (_DECODE_BY_CONSTRUCTOR, _PYTHON_BY_CONSTRUCTOR, _decode_timestamp_lazy, _decode_uuid_lazy),
+        (_DECODE_AT_CONSTRUCTOR, _PYTHON_AT_CONSTRUCTOR, _decode_timestamp_lazy_at, _decode_uuid_lazy_at),
+        (_DECODE_AT_CONSTRUCTOR_STRICT, _PYTHON_AT_CONSTRUCTOR, _decode_timestamp_lazy_at, _decode_uuid_lazy_at),
+    )
+    for table, defaults, decode_timestamp, decode_uuid in tables:
+        table[131] = decode_timestamp if enabled else defaults[131]
+        table[152] = decode_uuid if enabled else defaults[152]
+    _install_native_decoders()
+
+
+def set_native_decoding(enabled):
+    # type: (bool) -> None
+    """Select whether the default decoders are replaced by the native ones from `_decode_accel`.
+
+    This is enabled on import if the optional extension has been built, and the results are
+    the same either way, except that a truncated binary, string or symbol raises an IndexError
+    rather than being sliced short. Decoders selected by the other `set_*` functions are not
+    replaced, but are still called for values nested in natively decoded ones.
+    """
+    global _NATIVE_DECODING  # pylint: disable=global-statement
+    if enabled and _decode_accel is None:
+        raise ImportError("The _decode_accel extension is required for native decoding.")
+    _NATIVE_DECODING = enabled
+    _install_native_decoders()
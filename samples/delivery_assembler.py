@@ -0,0 +1,88 @@
+#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+#--------------------------------------------------------------------------
+# pylint: disable=import-error
+
+import logging
+from typing import List, Tuple, Dict, Any, Callable, Optional  # pylint: disable=unused-import
+
+from decode_vlatest import decode_payload_at
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _join(fragments):
+    # type: (List[memoryview]) -> memoryview
+    buffer = memoryview(bytearray(sum(len(fragment) for fragment in fragments)))
+    start = 0
+    for fragment in fragments:
+        end = start + len(fragment)
+        buffer[start:end] = fragment
+        start = end
+    return buffer
+
+
+class DeliveryAssembler(object):
+    """Reassembles deliveries that are split across several transfer frames.
+
+    Transfer frames are added as the `fields` returned by `decode_frame` (with the payload as the
+    last entry). Payloads of transfers with `more` set are kept as a list of views per
+    (handle, delivery-id). Once the final transfer arrives, the payloads are copied exactly once
+    into a buffer allocated for the total size and the message is decoded from it. A delivery
+    that fits in a single transfer is decoded directly from the payload view, without any copy.
+
+    The payload views must remain valid until the delivery completes, which `FrameReader`
+    guarantees.
+
+    :param decode: The function used to decode the complete payload, e.g. `decode_payload_lazy`.
+    """
+
+    def __init__(self, decode=decode_payload_at):
+        # type: (Callable[[memoryview], Any]) -> None
+        self._decode = decode
+        # A link carries one delivery at a time, so the pending fragments are
+        # looked up by handle and keep the delivery-id of the first transfer.
+        self._pending = {}  # type: Dict[int, Tuple[int, List[memoryview]]]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._pending)
+
+    def add(self, fields):
+        # type: (List[Any]) -> Optional[Tuple[int, int, Any]]
+        """Add a transfer frame, returning `(handle, delivery_id, message)` if it completes a delivery."""
+        payload = fields[-1]
+        count = len(fields) - 1
+        handle = fields[0]
+        delivery_id = fields[1] if count > 1 else None
+        try:
+            pending_id, fragments = self._pending[handle]
+        except KeyError:
+            fragments = None
+        else:
+            if delivery_id is not None and delivery_id != pending_id:
+                raise ValueError("Transfer for delivery {} received on handle {} while delivery {} is incomplete".format(
+                    delivery_id, handle, pending_id))
+            delivery_id = pending_id
+        if count > 9 and fields[9]:
+            # Aborted: discard anything received so far.
+            self._pending.pop(handle, None)
+            return None
+        if count > 5 and fields[5]:
+            if fragments is None:
+                self._pending[handle] = (delivery_id, [payload])
+            else:
+                fragments.append(payload)
+            return None
+        if fragments is None:
+            return handle, delivery_id, self._decode(payload)
+        del self._pending[handle]
+        fragments.append(payload)
+        return handle, delivery_id, self._decode(_join(fragments))
+
+    def discard(self, handle):
+        # type: (int) -> None
+        """Drop the incomplete delivery on `handle`, e.g. when the link is detached."""
+        self._pending.pop(handle, None)
@@ -0,0 +1,109 @@
+#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+#--------------------------------------------------------------------------
+# pylint: disable=import-error
+
+import struct
+import logging
+from typing import Iterator, Tuple, Any  # pylint: disable=unused-import
+
+from pyamqp2.constants import MAX_FRAME_SIZE_BYTES
+from decode_vlatest import decode_frame_at, decode_empty_frame
+
+_LOGGER = logging.getLogger(__name__)
+_HEADER_PREFIX = memoryview(b'AMQP')
+_FRAME_HEADER = struct.Struct('>IBBH')
+_FRAME_HEADER_SIZE = 8
+_MIN_READ_SIZE = 4096
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+class FrameReader(object):
+    """Incremental frame parser for data arriving in arbitrary chunks.
+
+    Incoming bytes are written once into a single receive buffer, either directly by the socket
+    via `get_buffer`/`buffer_updated` (e.g. `sock.recv_into(reader.get_buffer())`) or by copying
+    a chunk with `feed`. `frames` then yields `(channel, frame_type, fields)` for every frame
+    that has been completely received, where `frame_type` and `fields` are as returned by
+    `decode_frame` (or `decode_empty_frame` for protocol headers and heartbeats).
+
+    The buffer is never compacted in place: when it runs out of room a new one is allocated and
+    only the partially received frame is carried over. The transfer payload views yielded for
+    earlier frames therefore remain valid for as long as the caller holds on to them.
+
+    :param int buffer_size: Initial size of the receive buffer in bytes.
+    :param int max_frame_size: Frames declaring a larger size raise a ValueError.
+    :param bool strict: Whether performatives are decoded strictly, raising a `DecodeError` if malformed.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, max_frame_size=MAX_FRAME_SIZE_BYTES, strict=False):
+        # type: (int, int, bool) -> None
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # First byte not yet parsed into a frame.
+        self._end = 0  # First byte not yet written.
+        self._max_frame_size = max_frame_size
+        self._strict = strict
+
+    def __len__(self):
+        # type: () -> int
+        return self._end - self._start
+
+    def _reserve(self, size):
+        # type: (int) -> None
+        if len(self._buffer) - self._end >= size:
+            return
+        pending = self._end - self._start
+        buffer = bytearray(max(len(self._buffer), pending + size))
+        buffer[:pending] = self._view[self._start:self._end]
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._start = 0
+        self._end = pending
+
+    def get_buffer(self, sizehint=-1):
+        # type: (int) -> memoryview
+        """Return the writable tail of the receive buffer, with room for at least `sizehint` bytes."""
+        self._reserve(sizehint if sizehint > 0 else _MIN_READ_SIZE)
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes):
+        # type: (int) -> None
+        """Mark `nbytes` written into the view returned by `get_buffer` as received."""
+        self._end += nbytes
+
+    def feed(self, data):
+        # type: (bytes) -> None
+        """Copy a received chunk into the receive buffer."""
+        size = len(data)
+        self._reserve(size)
+        self._view[self._end:self._end + size] = data
+        self._end += size
+
+    def frames(self):
+        # type: () -> Iterator[Tuple[int, int, Any]]
+        """Yield every complete frame currently in the buffer, leaving any partial frame pending."""
+        while self._end - self._start >= _FRAME_HEADER_SIZE:
+            view = self._view
+            start = self._start
+            if view[start:start + 4] == _HEADER_PREFIX:
+                self._start = start + _FRAME_HEADER_SIZE
+                yield (0,) + decode_empty_frame(view[start:self._start])
+                continue
+            size, doff, _, channel = _FRAME_HEADER.unpack_from(view, start)
+            if size > self._max_frame_size or size < _FRAME_HEADER_SIZE:
+                raise ValueError("Received frame with invalid size: {}".format(size))
+            available = self._end - start
+            if available < size:
+                # Make sure the rest of the frame can be received without another copy.
+                self._reserve(size - available)
+                return
+            self._start = start + size
+            if size == _FRAME_HEADER_SIZE:
+                yield (channel,) + decode_empty_frame(view[start:self._start])
+                continue
+            frame_type, fields = decode_frame_at(view[start:self._start], doff * 4, self._strict)
+            yield channel, frame_type, fields
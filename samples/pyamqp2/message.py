@@ -166,7 +166,7 @@ if _CAN_ADD_DOCSTRING:
     """
 
 # TODO: should be a class, namedtuple or dataclass, immutability vs performance, need to collect performance data
-Message = namedtuple(
+class Message(namedtuple(
     'message',
     [
         'header',
@@ -178,7 +178,20 @@ Message = namedtuple(
         'sequence',
         'value',
         'footer',
-    ])
+    ])):
+    __slots__ = ()
+
+    def detach(self):
+        """Return the message with any zero-copy data sections materialized as bytes.
+
+        Data decoded with `zero_copy` holds memoryview slices of the transfer buffer they were
+        received in. The returned message no longer references that buffer.
+        """
+        if not self.data:
+            return self
+        return self._replace(data=[bytes(item) for item in self.data])
+
+
 Message.__new__.__defaults__ = (None,) * len(Message._fields)
 Message._code = 0
 Message._definition = (
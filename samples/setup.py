@@ -0,0 +1,22 @@
+#-------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+#--------------------------------------------------------------------------
+"""Build script for the optional `_decode_accel` extension of decode_vlatest.
+
+Build it next to decode_vlatest with:
+    python setup.py build_ext --inplace
+
+and check it against the pure Python decoders with:
+    REQUIRE_DECODE_ACCEL=1 python decode_test.py
+"""
+
+from setuptools import setup, Extension
+
+setup(
+    name='decode-accel',
+    version='0.0.1',
+    description='Native decoders for the constructor tables of decode_vlatest',
+    ext_modules=[Extension('_decode_accel', sources=['_decode_accel.c'], extra_compile_args=['-O2'])],
+)